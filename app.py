@@ -19,9 +19,11 @@ Requirements
 - GROQ_API_KEY in env or .env for generation
 """
 
+import hashlib
+import heapq
 import os
 import sys
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 import streamlit as st
 
@@ -35,19 +37,27 @@ def _load_env() -> None:
 
 
 def _ensure_paths() -> None:
+    # Streamlit re-executes this file on every rerun; only add each path once
+    # so sys.path (and every import lookup) doesn't grow with each click.
     here = os.path.abspath(os.path.dirname(__file__))
     root = here
-    sys.path.insert(0, os.path.join(root, 'src'))
-    sys.path.insert(0, os.path.join(root, 'scripts'))
+    for path in (os.path.join(root, 'src'), os.path.join(root, 'scripts')):
+        if path not in sys.path:
+            sys.path.insert(0, path)
 
 
 _ensure_paths()
 _load_env()
 
-from retrieval.retriever import query_collection, build_context
-from generation.prompt import allowed_context_chars, format_sources
-from generation.llm import generate_with_openai_compatible
+from retrieval.retriever import (
+    build_context, clip_documents, forget_collection, get_chroma_client, query_collection, query_collection_many,
+)
+from generation.prompt import allowed_context_chars, fit_context_tokens, format_sources
+from generation.llm import stream_with_openai_compatible
 from scripts.run_pipeline import ingest_repo, chunk_files, store_embeddings
+from ingest import github_client
+from ingest.embeddings import detect_device, drop_search_indexes, get_sbert_model
+import ui_templates
 
 
 st.set_page_config(
@@ -68,6 +78,17 @@ groq_model = os.getenv("GROQ_MODEL") or "llama-3.1-8b-instant"
 groq_base = os.getenv("GROQ_API_BASE") or "https://api.groq.com/openai"
 groq_key = os.getenv("GROQ_API_KEY")
 
+# Characters of each retrieved chunk shown (and kept in history) as a source
+SOURCE_PREVIEW_CHARS = 800
+
+# Quick-start questions shown as buttons: (label, question)
+PRESET_QUESTIONS = [
+    ("📝 What does main.py do?", "What does main.py do?"),
+    ("🏗️ Explain the architecture", "Explain the overall architecture and design of this project."),
+    ("📁 Explain folder structure", "Explain the folder structure and organization."),
+    ("🔧 How does it handle errors?", "How does this project handle errors and exceptions?"),
+]
+
 # Initialize session state
 if "stage" not in st.session_state:
     st.session_state.stage = "welcome"  # welcome, ingested, qa
@@ -93,6 +114,9 @@ if "chunk_count" not in st.session_state:
 if "conversation_history" not in st.session_state:
     st.session_state.conversation_history = []
 
+if "conversation_rendered" not in st.session_state:
+    st.session_state.conversation_rendered = []  # (label, markdown) per history turn
+
 if "out_raw" not in st.session_state:
     st.session_state.out_raw = None
 
@@ -110,12 +134,78 @@ def format_answer_as_tutorial(answer: str) -> str:
     return prefix + answer
 
 
+def render_history_turn(number: int, conv: dict) -> Tuple[str, str]:
+    """Return (expander label, markdown body) for one conversation turn.
+
+    The answer stays markdown (no HTML), so code fences, lists and links look
+    the same as in the live streamed answer.
+    """
+    label = f"Q{number}: {conv['question'][:50]}..."
+    body = f"**Question:** {conv['question']}\n\n**Answer:** {conv['answer'][:500]}..."
+    return label, body
+
+
 def show_celebration() -> None:
-    """Show a success celebration when repo is ingested"""
-    st.balloons()
+    """Show a success celebration when repo is ingested.
+
+    Balloons are opt-in (GIST_FX=1): the animation costs an extra frontend
+    round trip for no functional benefit.
+    """
+    if os.getenv("GIST_FX") == "1":
+        st.balloons()
     st.success("✅ Repository processed successfully! You can now ask questions.")
 
 
+def ingestion_cache_key(slug: str, sha: str, model: str, chunk_size: int, overlap: int) -> str:
+    """Short hash identifying one ingestion: same commit + settings => same key."""
+    raw = f"{slug}|{sha}|{model}|{chunk_size}|{overlap}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def completion_marker_path(chroma_dir: str, name: str) -> str:
+    """Sidecar file written once a collection has been fully stored."""
+    return os.path.join(chroma_dir, f"{name}.complete")
+
+
+def mark_collection_complete(chroma_dir: str, name: str) -> None:
+    """Record that every chunk of ``name`` made it into the vector store."""
+    with open(completion_marker_path(chroma_dir, name), "w", encoding="utf-8"):
+        pass
+
+
+def existing_collection_count(chroma_dir: str, name: str) -> int:
+    """Return the number of records in a completely stored Chroma collection.
+
+    Returns 0 if the collection doesn't exist or an earlier ingestion died
+    before finishing it, so a partial collection is never reused.
+    """
+    if not os.path.exists(completion_marker_path(chroma_dir, name)):
+        return 0
+    try:
+        return get_chroma_client(chroma_dir).get_collection(name=name).count()
+    except Exception:
+        return 0
+
+
+def discard_collection(chroma_dir: str, name: str) -> None:
+    """Drop a partially written collection so the next attempt starts clean."""
+    try:
+        os.remove(completion_marker_path(chroma_dir, name))
+    except OSError:
+        pass
+    try:
+        get_chroma_client(chroma_dir).delete_collection(name=name)
+    except Exception:
+        pass
+    drop_search_indexes(chroma_dir, name)
+    forget_collection(chroma_dir, name)
+
+
+def count_files(root: str) -> int:
+    """Count files under a directory (0 if it's missing)."""
+    return sum(len(files) for _, _, files in os.walk(root))
+
+
 def build_file_tree(root: str, max_depth: int = 3, max_items: int = 150) -> str:
     """Build a visual tree of the repository structure"""
     if not os.path.isdir(root):
@@ -127,41 +217,93 @@ def build_file_tree(root: str, max_depth: int = 3, max_items: int = 150) -> str:
     lines.append(f"📁 {prefix_root}")
     count = 0
     
-    for dirpath, dirnames, filenames in os.walk(root):
-        depth = dirpath[len(root):].count(os.sep)
-        if depth > max_depth:
+    # Depth-first, same visiting order as os.walk, but scandir's cached
+    # DirEntry types avoid extra stat calls and we never descend past max_depth.
+    stack = [(root, 0)]
+    while stack:
+        dirpath, depth = stack.pop()
+        try:
+            with os.scandir(dirpath) as it:
+                entries = list(it)
+        except OSError:
             continue
+        dirnames: List[str] = []
+        filenames: List[str] = []
+        subdirs: List[str] = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                dirnames.append(entry.name)
+                if depth < max_depth and not entry.is_symlink():
+                    subdirs.append(entry.path)
+            else:
+                filenames.append(entry.name)
         indent = "  " * depth
         
-        # Show directories
-        for d in sorted(dirnames)[:50]:
+        # Show directories (nsmallest == sorted()[:50] without a full sort)
+        for d in heapq.nsmallest(50, dirnames):
             if count >= max_items:
                 break
             lines.append(f"{indent}├─ 📁 {d}/")
             count += 1
         
         # Show files
-        for f in sorted(filenames)[:50]:
+        for f in heapq.nsmallest(50, filenames):
             if count >= max_items:
                 break
             # Add file icons based on extension
-            icon = "📄"
-            if f.endswith(('.py', '.js', '.ts', '.java', '.cpp', '.c')):
-                icon = "💻"
-            elif f.endswith(('.md', '.txt', '.rst')):
-                icon = "📝"
-            elif f.endswith(('.json', '.yaml', '.yml', '.xml', '.toml')):
-                icon = "⚙️"
+            icon = ui_templates.FILE_ICONS.get(os.path.splitext(f)[1].lower(), ui_templates.FILE_ICON)
             lines.append(f"{indent}└─ {icon} {f}")
             count += 1
         
         if count >= max_items:
             lines.append("  ... (more files not shown)")
             break
+        stack.extend((p, depth + 1) for p in reversed(subdirs))
     
     return "\n".join(lines)
 
 
+@st.cache_data(show_spinner=False)
+def cached_file_tree(root: str, collection: str) -> str:
+    """build_file_tree memoized per (root, collection) so reruns don't re-walk the disk.
+
+    The collection name pins the commit that was ingested; since a fallback
+    name can repeat across commits, ingestion also clears this cache.
+    """
+    return build_file_tree(root)
+
+
+@st.cache_resource(show_spinner="🧠 Loading embedding model...")
+def get_embedder(name: str):
+    """Load the Sentence-Transformers model once per server process.
+
+    Retrieval and ingestion look the model up by name in the same in-process
+    cache, so warming it here means no question pays the cold-load cost.
+    """
+    return get_sbert_model(name)
+
+
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def cached_query_collection(chroma_dir: str, collection_name: str, question: str, k: int, model: str) -> List[dict]:
+    """query_collection memoized on its arguments.
+
+    Re-asking a question (e.g. clicking a preset twice) skips the embed + search.
+    Re-ingestion uses a new collection name, so stale hits can't leak across repos.
+    """
+    return query_collection(
+        chroma_dir=chroma_dir,
+        collection_name=collection_name,
+        query=question,
+        model=model,
+        k=k,
+        where=None,
+    )
+
+
 # ============================================================================
 # Sidebar (Advanced Settings - Collapsed by Default)
 # ============================================================================
@@ -200,22 +342,191 @@ with st.sidebar:
     st.caption(f"Using embeddings: `{embed_model}`")
 
 
+# ============================================================================
+# Q&A Panel
+# ============================================================================
+
+@st.fragment
+def qa_panel(top_k: int, max_tokens: int, temperature: float) -> None:
+    """Question/answer column of the ingested stage.
+
+    Runs as a fragment: preset and "Get Answer" clicks rerun only this panel,
+    not the sidebar, banner, or folder tree.
+    """
+    st.markdown("### 💬 Ask Questions")
+    
+    st.markdown(ui_templates.TIP_HTML, unsafe_allow_html=True)
+    
+    get_embedder(embed_model)
+    
+    # Retrieve context for all preset questions in one batched search
+    # when the Q&A stage loads, so clicking a preset skips retrieval.
+    preset_key = (st.session_state.chroma_dir, st.session_state.collection, int(top_k), embed_model)
+    if st.session_state.get("preset_results_key") != preset_key:
+        try:
+            preset_batches = query_collection_many(
+                st.session_state.chroma_dir,
+                st.session_state.collection,
+                [q for _, q in PRESET_QUESTIONS],
+                model=embed_model,
+                k=int(top_k),
+            )
+            st.session_state.preset_results = {
+                q: res for (_, q), res in zip(PRESET_QUESTIONS, preset_batches)
+            }
+        except Exception:
+            # Fall back to per-question retrieval on click
+            st.session_state.preset_results = {}
+        st.session_state.preset_results_key = preset_key
+    
+    # Preset question buttons
+    st.markdown("**🎯 Quick Start Questions:**")
+    
+    preset_col1, preset_col2 = st.columns(2)
+    
+    for i, (label, preset_question) in enumerate(PRESET_QUESTIONS):
+        with (preset_col1 if i < 2 else preset_col2):
+            if st.button(label, use_container_width=True):
+                st.session_state.current_question = preset_question
+                st.session_state.trigger_ask = True
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Custom question input
+    st.markdown("**✍️ Or ask your own:**")
+    question = st.text_area(
+        "",
+        placeholder="e.g., How are database connections managed?",
+        height=100,
+        key="question_input",
+        label_visibility="collapsed"
+    )
+    
+    ask_button = st.button("🔍 Get Answer", type="primary", use_container_width=True)
+    
+    # Handle question (from button or preset)
+    should_ask = ask_button or st.session_state.get("trigger_ask", False)
+    
+    if should_ask:
+        # Clear trigger
+        if "trigger_ask" in st.session_state:
+            st.session_state.trigger_ask = False
+        
+        # Get the question (from preset or input)
+        if "current_question" in st.session_state and st.session_state.current_question:
+            question = st.session_state.current_question
+            st.session_state.current_question = None
+        
+        if not question.strip():
+            st.error("❌ Please enter a question")
+        elif not groq_key:
+            st.error("❌ GROQ_API_KEY is not configured. Add it to your .env file.")
+        else:
+            # Ensure collection is set
+            collection_name = st.session_state.collection
+            if not collection_name:
+                st.error("❌ No collection selected. Please ingest a repository first.")
+                st.stop()
+            
+            try:
+                # Show what we're doing
+                with st.spinner("🔍 Searching the codebase for relevant context..."):
+                    results = st.session_state.get("preset_results", {}).get(question)
+                    if results is None:
+                        results = cached_query_collection(
+                            st.session_state.chroma_dir,
+                            collection_name,
+                            question,
+                            int(top_k),
+                            embed_model,
+                        )
+                
+                if not results:
+                    st.warning("⚠️ No relevant code found for this question. Try rephrasing?")
+                else:
+                    ctx_chars = allowed_context_chars(4096, int(max_tokens))
+                    context_block = fit_context_tokens(build_context(results, max_chars=ctx_chars), question, 4096, int(max_tokens))
+                    
+                    # Display answer in a nice card
+                    st.markdown("---")
+                    st.markdown(ui_templates.QUESTION_CARD_TEMPLATE.format(question=question), unsafe_allow_html=True)
+                    
+                    # Answer with educational framing, rendered token by
+                    # token as the model streams it back
+                    st.markdown("#### 🧠 Answer")
+                    answer_parts: List[str] = []
+                    
+                    def answer_stream():
+                        yield format_answer_as_tutorial("")
+                        for token in stream_with_openai_compatible(
+                            context_block,
+                            question,
+                            api_base=groq_base,
+                            model=groq_model,
+                            api_key=groq_key,
+                            temperature=float(temperature),
+                            max_tokens=int(max_tokens),
+                            top_p=0.9,
+                        ):
+                            answer_parts.append(token)
+                            yield token
+                    
+                    st.write_stream(answer_stream())
+                    answer = "".join(answer_parts).strip()
+                    
+                    # Past this point only previews are needed; keep the
+                    # history from pinning full chunk texts in session state
+                    sources = clip_documents(results[:5], SOURCE_PREVIEW_CHARS)
+                    
+                    # Add to conversation history
+                    st.session_state.conversation_history.append({
+                        "question": question,
+                        "answer": answer,
+                        "sources": sources
+                    })
+                    
+                    # Sources in expandable section
+                    with st.expander("📚 View Sources (code snippets used)", expanded=False):
+                        st.caption(f"Retrieved {len(results)} relevant code chunks")
+                        
+                        for i, r in enumerate(sources, start=1):
+                            meta = r.get("metadata", {}) or {}
+                            file_path = meta.get("file_path", "unknown")
+                            chunk_index = meta.get("chunk_index", 0)
+                            
+                            st.markdown(f"**Source {i}: `{file_path}` (chunk {chunk_index})**")
+                            st.code(r["document"], language="python")
+                            st.markdown("---")
+                    
+                    # Encourage follow-up
+                    st.markdown(ui_templates.FOLLOW_UP_HTML, unsafe_allow_html=True)
+            
+            except Exception as e:
+                st.error(f"❌ Error generating answer: {str(e)}")
+                st.exception(e)
+    
+    # Show conversation history
+    if st.session_state.conversation_history:
+        st.markdown("---")
+        st.markdown("### 📜 Conversation History")
+        
+        # Turns are formatted once when first shown; reruns reuse the cached
+        # markdown for the last three
+        history = st.session_state.conversation_history
+        rendered = st.session_state.conversation_rendered
+        for n in range(len(rendered), len(history)):
+            rendered.append(render_history_turn(n + 1, history[n]))
+        for label, body in reversed(rendered[-3:]):
+            with st.expander(label, expanded=False):
+                st.markdown(body)
+
+
 # ============================================================================
 # Main UI Flow
 # ============================================================================
 
 # Welcome Header - Always visible at top
-st.markdown(
-    """
-    <div style="text-align: center; padding: 2rem 1rem 1rem 1rem;">
-        <h1 style="margin: 0; font-size: 2.5rem;">💡 GitHub Repo Explainer Bot</h1>
-        <p style="color: #666; font-size: 1.2rem; margin-top: 0.5rem;">
-            Understand any open-source repo — explained in simple terms
-        </p>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+st.markdown(ui_templates.HEADER_HTML, unsafe_allow_html=True)
 
 
 # ============================================================================
@@ -228,20 +539,7 @@ if st.session_state.stage == "welcome":
     # Hero section
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        st.markdown(
-            """
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                        padding: 2rem; border-radius: 15px; color: white; text-align: center;
-                        box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-                <h2 style="margin: 0 0 1rem 0;">🎓 Learn by Exploring</h2>
-                <p style="font-size: 1.1rem; margin: 0;">
-                    Paste a GitHub link below and I'll help you understand the project.<br>
-                    Ask questions in plain English — I'll explain like a teacher.
-                </p>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        st.markdown(ui_templates.HERO_HTML, unsafe_allow_html=True)
         
         st.markdown("<br>", unsafe_allow_html=True)
         
@@ -288,6 +586,33 @@ if st.session_state.stage == "welcome":
                 
                 ingest_repo._path_excludes = exclude_paths  # type: ignore[attr-defined]
                 
+                # Name the collection after the exact commit and settings so
+                # re-ingesting an unchanged repo can reuse the stored vectors.
+                try:
+                    owner, gh_repo = github_client.parse_github_url(repo_url)
+                    with github_client.create_session(token, pool_size=1) as gh_session:
+                        repo_info = github_client.get_repo_info(owner, gh_repo, token=token, session=gh_session)
+                        head_sha = github_client.get_branch_head_sha(
+                            owner, gh_repo, repo_info.get("default_branch", "main"), token=token, session=gh_session
+                        )
+                    key = ingestion_cache_key(slug, head_sha, embed_model, chunk_size, overlap)
+                    collection = f"{repo_name}_{key}"
+                    cached_chunks = existing_collection_count(chroma_dir, collection)
+                except Exception:
+                    # Lookup failed (rate limit, network); just ingest from scratch
+                    cached_chunks = 0
+                
+                if cached_chunks > 0:
+                    st.session_state.stage = "ingested"
+                    st.session_state.collection = collection
+                    st.session_state.repo_name = repo_name
+                    st.session_state.repo_url = repo_url
+                    st.session_state.file_count = count_files(out_raw)
+                    st.session_state.chunk_count = cached_chunks
+                    st.session_state.out_raw = out_raw
+                    st.session_state.chroma_dir = chroma_dir
+                    st.rerun()
+                
                 # Show progress with detailed steps
                 with st.status("🔄 Processing repository...", expanded=True) as status:
                     try:
@@ -314,11 +639,23 @@ if st.session_state.stage == "welcome":
                         st.write(f"✅ Created **{chunks_count}** searchable chunks")
                         
                         # Step 3: Embed & Store
-                        st.write(f"🧠 Creating embeddings with **{embed_model}**...")
+                        st.write(f"🧠 Creating embeddings with **{embed_model}** on **{detect_device()}**...")
+                        get_embedder(embed_model)
                         st.caption("This may take a minute for large repos...")
-                        store_embeddings(chunks_out, chroma_dir, collection, embed_model, 64, False)
-                        
-                        st.write("💾 Storing in vector database...")
+                        # Embedding and database writes overlap; show both counters
+                        embed_progress = st.empty()
+
+                        def _show_embed_progress(embedded: int, stored: int) -> None:
+                            embed_progress.write(
+                                f"🧠 Embedded **{embedded}/{chunks_count}** chunks • "
+                                f"💾 stored **{stored}** in vector database..."
+                            )
+
+                        stored_count = store_embeddings(chunks_out, chroma_dir, collection, embed_model, 200, False,
+                                                        progress=_show_embed_progress)
+                        embed_progress.write(f"💾 Stored **{stored_count}** chunks in vector database")
+                        mark_collection_complete(chroma_dir, collection)
+                        cached_file_tree.clear()
                         
                         # Success!
                         status.update(label="✅ Repository indexed successfully!", state="complete")
@@ -332,14 +669,15 @@ if st.session_state.stage == "welcome":
                         st.session_state.chunk_count = chunks_count
                         st.session_state.out_raw = out_raw
                         st.session_state.chroma_dir = chroma_dir
-                        
-                        # Show celebration
-                        show_celebration()
+                        # Celebrate once on the Q&A screen rather than rendering
+                        # it here only to be replaced by the rerun
+                        st.session_state.just_ingested = True
                         
                         # Auto-rerun to show Q&A interface
                         st.rerun()
                         
                     except Exception as e:
+                        discard_collection(chroma_dir, collection)
                         status.update(label="❌ Error during processing", state="error")
                         st.error(f"Something went wrong: {str(e)}")
                         st.exception(e)
@@ -351,22 +689,21 @@ if st.session_state.stage == "welcome":
 
 elif st.session_state.stage == "ingested":
     
+    # Values for the banner/card templates
+    repo_view = {
+        "repo_name": st.session_state.repo_name,
+        "repo_url": st.session_state.repo_url,
+        "file_count": st.session_state.file_count,
+        "chunk_count": st.session_state.chunk_count,
+        "collection": st.session_state.collection,
+    }
+    
+    if st.session_state.pop("just_ingested", False):
+        show_celebration()
+    
     # Show repo summary banner
     st.markdown("---")
-    st.markdown(
-        f"""
-        <div style="background: linear-gradient(90deg, #11998e 0%, #38ef7d 100%);
-                    padding: 1.5rem; border-radius: 10px; color: white; margin-bottom: 1rem;">
-            <h3 style="margin: 0;">✅ Repository Ready: {st.session_state.repo_name}</h3>
-            <p style="margin: 0.5rem 0 0 0; opacity: 0.95;">
-                📦 {st.session_state.file_count} files • 
-                📄 {st.session_state.chunk_count} chunks • 
-                💾 Stored in <code>{st.session_state.collection}</code>
-            </p>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    st.markdown(ui_templates.REPO_BANNER_TEMPLATE.format_map(repo_view), unsafe_allow_html=True)
     
     # Two-column layout: Repo info (left) + Q&A (right)
     left_col, right_col = st.columns([1, 2])
@@ -375,26 +712,14 @@ elif st.session_state.stage == "ingested":
         st.markdown("### 🗂️ Repository Summary")
         
         # Repo details card
-        st.markdown(
-            f"""
-            <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; 
-                        border-left: 4px solid #667eea;">
-                <p style="margin: 0;"><strong>Repository:</strong><br>
-                   <a href="{st.session_state.repo_url}" target="_blank">{st.session_state.repo_name}</a>
-                </p>
-                <p style="margin: 0.5rem 0 0 0;"><strong>Files indexed:</strong> {st.session_state.file_count}</p>
-                <p style="margin: 0.5rem 0 0 0;"><strong>Code chunks:</strong> {st.session_state.chunk_count}</p>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        st.markdown(ui_templates.REPO_CARD_TEMPLATE.format_map(repo_view), unsafe_allow_html=True)
         
         st.markdown("<br>", unsafe_allow_html=True)
         
         # File tree preview
         with st.expander("📂 View Folder Structure", expanded=False):
             if st.session_state.out_raw and os.path.isdir(st.session_state.out_raw):
-                tree = build_file_tree(st.session_state.out_raw)
+                tree = cached_file_tree(st.session_state.out_raw, st.session_state.collection)
                 st.code(tree, language="text")
             else:
                 st.caption("File tree not available")
@@ -404,181 +729,11 @@ elif st.session_state.stage == "ingested":
         if st.button("🔄 Index a Different Repo", use_container_width=True):
             st.session_state.stage = "welcome"
             st.session_state.conversation_history = []
+            st.session_state.conversation_rendered = []
             st.rerun()
     
     with right_col:
-        st.markdown("### 💬 Ask Questions")
-        
-        st.markdown(
-            """
-            <div style="background: #fff3cd; padding: 1rem; border-radius: 8px; 
-                        border-left: 4px solid #ffc107; margin-bottom: 1rem;">
-                <p style="margin: 0; color: #856404;">
-                    💡 <strong>Tip:</strong> Ask specific questions like:
-                    "What does main.py do?" or "How does authentication work?"
-                </p>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-        
-        # Preset question buttons
-        st.markdown("**🎯 Quick Start Questions:**")
-        
-        preset_col1, preset_col2 = st.columns(2)
-        
-        with preset_col1:
-            if st.button("📝 What does main.py do?", use_container_width=True):
-                st.session_state.current_question = "What does main.py do?"
-                st.session_state.trigger_ask = True
-            
-            if st.button("🏗️ Explain the architecture", use_container_width=True):
-                st.session_state.current_question = "Explain the overall architecture and design of this project."
-                st.session_state.trigger_ask = True
-        
-        with preset_col2:
-            if st.button("📁 Explain folder structure", use_container_width=True):
-                st.session_state.current_question = "Explain the folder structure and organization."
-                st.session_state.trigger_ask = True
-            
-            if st.button("🔧 How does it handle errors?", use_container_width=True):
-                st.session_state.current_question = "How does this project handle errors and exceptions?"
-                st.session_state.trigger_ask = True
-        
-        st.markdown("<br>", unsafe_allow_html=True)
-        
-        # Custom question input
-        st.markdown("**✍️ Or ask your own:**")
-        question = st.text_area(
-            "",
-            placeholder="e.g., How are database connections managed?",
-            height=100,
-            key="question_input",
-            label_visibility="collapsed"
-        )
-        
-        ask_button = st.button("🔍 Get Answer", type="primary", use_container_width=True)
-        
-        # Handle question (from button or preset)
-        should_ask = ask_button or st.session_state.get("trigger_ask", False)
-        
-        if should_ask:
-            # Clear trigger
-            if "trigger_ask" in st.session_state:
-                st.session_state.trigger_ask = False
-            
-            # Get the question (from preset or input)
-            if "current_question" in st.session_state and st.session_state.current_question:
-                question = st.session_state.current_question
-                st.session_state.current_question = None
-            
-            if not question.strip():
-                st.error("❌ Please enter a question")
-            elif not groq_key:
-                st.error("❌ GROQ_API_KEY is not configured. Add it to your .env file.")
-            else:
-                # Ensure collection is set
-                collection_name = st.session_state.collection
-                if not collection_name:
-                    st.error("❌ No collection selected. Please ingest a repository first.")
-                    st.stop()
-                
-                try:
-                    # Show what we're doing
-                    with st.spinner("🔍 Searching the codebase for relevant context..."):
-                        results = query_collection(
-                            chroma_dir=st.session_state.chroma_dir,
-                            collection_name=collection_name,
-                            query=question,
-                            model=embed_model,
-                            k=int(top_k),
-                            where=None,
-                        )
-                    
-                    if not results:
-                        st.warning("⚠️ No relevant code found for this question. Try rephrasing?")
-                    else:
-                        ctx_chars = allowed_context_chars(4096, int(max_tokens))
-                        context_block = build_context(results, max_chars=ctx_chars)
-                        
-                        with st.spinner("🤔 Generating explanation..."):
-                            answer = generate_with_openai_compatible(
-                                context_block,
-                                question,
-                                api_base=groq_base,
-                                model=groq_model,
-                                api_key=groq_key,
-                                temperature=float(temperature),
-                                max_tokens=int(max_tokens),
-                                top_p=0.9,
-                            )
-                        
-                        # Add to conversation history
-                        st.session_state.conversation_history.append({
-                            "question": question,
-                            "answer": answer,
-                            "sources": results
-                        })
-                        
-                        # Display answer in a nice card
-                        st.markdown("---")
-                        st.markdown(
-                            f"""
-                            <div style="background: #e7f3ff; padding: 1rem; border-radius: 8px; 
-                                        border-left: 4px solid #2196F3; margin: 1rem 0;">
-                                <strong style="color: #1976D2;">❓ Your Question:</strong>
-                                <p style="margin: 0.5rem 0 0 0; color: #333;">{question}</p>
-                            </div>
-                            """,
-                            unsafe_allow_html=True
-                        )
-                        
-                        # Answer with educational framing
-                        st.markdown("#### 🧠 Answer")
-                        formatted_answer = format_answer_as_tutorial(answer)
-                        st.markdown(formatted_answer)
-                        
-                        # Sources in expandable section
-                        with st.expander("📚 View Sources (code snippets used)", expanded=False):
-                            st.caption(f"Retrieved {len(results)} relevant code chunks")
-                            
-                            for i, r in enumerate(results[:5], start=1):
-                                meta = r.get("metadata", {}) or {}
-                                file_path = meta.get("file_path", "unknown")
-                                chunk_index = meta.get("chunk_index", 0)
-                                
-                                st.markdown(f"**Source {i}: `{file_path}` (chunk {chunk_index})**")
-                                code_snippet = (r.get("document", "") or "")[:800]
-                                st.code(code_snippet, language="python")
-                                st.markdown("---")
-                        
-                        # Encourage follow-up
-                        st.markdown(
-                            """
-                            <div style="background: #f0f0f0; padding: 0.75rem; border-radius: 6px; 
-                                        margin-top: 1rem; text-align: center;">
-                                <p style="margin: 0; color: #666;">
-                                    💭 <strong>Have a follow-up question?</strong> 
-                                    Just ask above — I remember the context!
-                                </p>
-                            </div>
-                            """,
-                            unsafe_allow_html=True
-                        )
-                
-                except Exception as e:
-                    st.error(f"❌ Error generating answer: {str(e)}")
-                    st.exception(e)
-        
-        # Show conversation history
-        if st.session_state.conversation_history:
-            st.markdown("---")
-            st.markdown("### 📜 Conversation History")
-            
-            for i, conv in enumerate(reversed(st.session_state.conversation_history[-3:]), start=1):
-                with st.expander(f"Q{len(st.session_state.conversation_history) - i + 1}: {conv['question'][:50]}...", expanded=False):
-                    st.markdown(f"**Question:** {conv['question']}")
-                    st.markdown(f"**Answer:** {conv['answer'][:500]}...")
+        qa_panel(int(top_k), int(max_tokens), float(temperature))
 
 
 # ============================================================================
@@ -586,14 +741,4 @@ elif st.session_state.stage == "ingested":
 # ============================================================================
 
 st.markdown("---")
-st.markdown(
-    """
-    <div style="text-align: center; color: #999; padding: 1rem;">
-        <p style="margin: 0;">Built with ❤️ using Streamlit, ChromaDB, and Groq LLM</p>
-        <p style="margin: 0.25rem 0 0 0; font-size: 0.9rem;">
-            Embeddings: sentence-transformers/all-MiniLM-L6-v2 • Model: {model}
-        </p>
-    </div>
-    """.format(model=groq_model),
-    unsafe_allow_html=True
-)
+st.markdown(ui_templates.FOOTER_TEMPLATE.format(model=groq_model), unsafe_allow_html=True)
@@ -30,6 +30,14 @@ def _load_env() -> None:
         pass
 
 
+def _enable_line_editing() -> None:
+    """Give input() arrow-key editing and history where readline exists (not on Windows)."""
+    try:
+        import readline  # type: ignore[import-not-found]  # noqa: F401
+    except ImportError:
+        pass
+
+
 def _prompt(msg: str, default: Optional[str] = None) -> str:
     suffix = f" {default}" if default is not None else ""
     val = input(f"{msg}{': ' if not suffix else f' [{default}]: '} ").strip()
@@ -44,7 +52,7 @@ def _ingest_chunk_embed(repo_url: str) -> tuple[str, str]:
     Returns (chroma_dir, collection)
     """
     # Defer imports to avoid global dependency costs
-    from scripts.run_pipeline import ingest_repo, chunk_files, store_embeddings
+    from scripts.run_pipeline import ingest_repo, stream_pipeline
 
     # Defaults
     token = os.getenv("GITHUB_TOKEN")
@@ -63,25 +71,20 @@ def _ingest_chunk_embed(repo_url: str) -> tuple[str, str]:
     overlap = 200
     embed_model = "sentence-transformers/all-MiniLM-L6-v2"
     batch_size = 64
-    use_dummy_embeddings = False
 
     # Wire excludes into ingest_repo hook
     ingest_repo._path_excludes = exclude_paths  # type: ignore[attr-defined]
 
-    print("\n✅ Fetching repo files...")
-    fetched = ingest_repo(repo_url, out_raw, token, max_size, include_exts)
+    # Fetching, chunking and embedding run as overlapping stages
+    print("\n✅ Fetching, chunking and embedding with all-MiniLM-L6-v2...")
+    fetched, chunks_count, _ = stream_pipeline(repo_url, out_raw, chunks_out, chroma_dir, collection, embed_model,
+                                               token, max_size, include_exts, chunk_size, overlap, batch_size)
     if fetched == 0:
         print("No files fetched; aborting.")
         sys.exit(2)
-
-    print("✅ Splitting into chunks...")
-    chunks_count = chunk_files(out_raw, slug, chunks_out, chunk_size, overlap)
     if chunks_count == 0:
         print("No chunks produced; aborting.")
         sys.exit(3)
-
-    print("✅ Creating embeddings with all-MiniLM-L6-v2...")
-    store_embeddings(chunks_out, chroma_dir, collection, embed_model, batch_size, use_dummy_embeddings)
     print(f"✅ Stored in Chroma DB (collection: {collection})")
 
     return chroma_dir, collection
@@ -94,6 +97,7 @@ def main() -> int:
     sys.path.insert(0, os.path.join(here, "src"))
 
     _load_env()
+    _enable_line_editing()
 
     print("Choose mode:")
     print("1) Ingest new GitHub repo")
@@ -105,11 +109,11 @@ def main() -> int:
         chroma_dir, collection = _ingest_chunk_embed(repo_url)
     else:
         chroma_dir = _prompt("Enter Chroma DB directory", "./chroma_db")
-        # Try to list collections for convenience; fall back to manual input
+        # Try to list collections for convenience; fall back to manual input.
+        # The cached client is the one the Q&A loop's queries reuse.
         try:
-            import chromadb  # type: ignore[import-not-found]
-            client = chromadb.PersistentClient(path=chroma_dir)
-            colls = client.list_collections()
+            from retrieval.retriever import get_chroma_client
+            colls = get_chroma_client(chroma_dir).list_collections()
             options = [c.name for c in colls]
             if options:
                 print("\nCollections found:")
@@ -133,8 +137,8 @@ def main() -> int:
     # Optional Q&A loop (Groq-only, minimal prompts)
     try:
         from retrieval.retriever import query_collection, build_context
-        from generation.prompt import allowed_context_chars, format_sources
-        from generation.llm import generate_with_openai_compatible
+        from generation.prompt import allowed_context_chars, fit_context_tokens, format_sources
+        from generation.llm import echo_stream, stream_with_openai_compatible
     except Exception as e:
         # Retrieval/generation modules not available; skip Q&A
         return 0
@@ -171,8 +175,8 @@ def main() -> int:
                 print("No results found for the query.")
                 continue
             ctx_chars = allowed_context_chars(n_ctx, max_tokens)
-            context_block = build_context(results, max_chars=ctx_chars)
-            answer = generate_with_openai_compatible(
+            context_block = fit_context_tokens(build_context(results, max_chars=ctx_chars), q, n_ctx, max_tokens)
+            stream = stream_with_openai_compatible(
                 context_block,
                 q,
                 api_base=groq_base,
@@ -183,7 +187,7 @@ def main() -> int:
                 top_p=top_p,
             )
             print("\n=== Answer ===\n")
-            print(answer)
+            echo_stream(stream)
             print("\n---\nSources:\n")
             for s in format_sources(results):
                 print(f"- {s}")
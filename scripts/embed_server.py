@@ -0,0 +1,36 @@
+"""Keep the embedding model loaded for the retrieval and generation CLIs.
+
+Start it once in a separate terminal; `query_retrieval.py`, `run_generation.py`
+and the interactive runners then embed queries through it instead of loading
+the model on every run (they fall back to loading it themselves if the server
+is not running).
+
+Example:
+PYTHONPATH=./src python scripts/embed_server.py --model sentence-transformers/all-MiniLM-L6-v2
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+
+from ingest import embed_service
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve query embeddings over a local Unix socket.")
+    parser.add_argument("--model", action="append", default=None, help="Sentence-Transformers model to preload (repeatable)")
+    parser.add_argument("--socket", default=None, help="Socket path (default: GIST_EMBED_SOCKET or a private per-user directory)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    models = args.model or ["sentence-transformers/all-MiniLM-L6-v2"]
+    print(f"Loading {', '.join(models)} ...")
+    try:
+        embed_service.serve(models, path=args.socket)
+    except KeyboardInterrupt:
+        print("Stopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -23,10 +23,14 @@ def main(argv: Optional[list[str]] = None) -> int:
     p.add_argument("--collection", required=True, help="Chroma collection name")
     p.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2", help="Sentence-Transformers model path/name")
     p.add_argument("--k", type=int, default=5, help="Top-K results to return")
+    p.add_argument("--mmr", type=float, default=None, metavar="LAMBDA", help="Rerank for diversity with MMR (0..1, higher favours relevance; e.g. 0.5)")
     p.add_argument("--file-type", dest="file_type", default=None, help="Optional metadata filter by file_type (e.g., code, markdown, config)")
     p.add_argument("--query", required=True, help="User query text")
     p.add_argument("--max-context-chars", type=int, default=8000, help="Max characters to include in the combined context output")
+    p.add_argument("--embed-backend", choices=("torch", "onnx"), default=None, help="Embedding backend (default: GIST_EMBED_BACKEND or torch); must match the one used at ingestion")
     args = p.parse_args(argv)
+    if args.embed_backend:
+        os.environ["GIST_EMBED_BACKEND"] = args.embed_backend
 
     where: Optional[Dict[str, Any]] = None
     if args.file_type:
@@ -39,6 +43,7 @@ def main(argv: Optional[list[str]] = None) -> int:
         model=args.model,
         k=args.k,
         where=where,
+        mmr_lambda=args.mmr,
     )
 
     print(f"Retrieved {len(results)} results\n")
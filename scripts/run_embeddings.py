@@ -9,7 +9,7 @@ import argparse
 import os
 import sys
 
-from ingest import embeddings
+from ingest import embeddings, flat_index
 
 
 def main(argv: list[str] | None = None) -> int:
@@ -19,7 +19,14 @@ def main(argv: list[str] | None = None) -> int:
     parser.add_argument("--collection", dest="collection", default="repo_embeddings", help="Chroma collection name")
     parser.add_argument("--model", dest="model", default="sentence-transformers/all-MiniLM-L6-v2", help="Sentence-Transformers model name (e.g., sentence-transformers/all-MiniLM-L6-v2)")
     parser.add_argument("--batch-size", dest="batch_size", type=int, default=64, help="Embedding batch size")
+    parser.add_argument("--quantize", choices=flat_index.QUANTIZE_CHOICES, default="int8", help="Storage format of the exact-search matrix written next to Chroma")
+    parser.add_argument("--embed-backend", choices=embeddings.EMBED_BACKENDS, default=None, help="Embedding backend (default: GIST_EMBED_BACKEND or torch); must match the one used at ingestion")
+    parser.add_argument("--device", choices=embeddings.EMBED_DEVICES, default=None, help="Torch device for embeddings (default: GIST_EMBED_DEVICE or auto: cuda, then mps, then cpu)")
     args = parser.parse_args(argv)
+    if args.embed_backend:
+        os.environ["GIST_EMBED_BACKEND"] = args.embed_backend
+    if args.device:
+        os.environ["GIST_EMBED_DEVICE"] = args.device
 
     input_file = args.input
     if not os.path.isfile(input_file):
@@ -28,7 +35,7 @@ def main(argv: list[str] | None = None) -> int:
 
     print(f"Embedding {input_file} -> Chroma dir {args.chroma_dir}, collection {args.collection}")
     try:
-        count, coll = embeddings.process_and_store(input_file, chroma_persist_directory=args.chroma_dir, collection_name=args.collection, model=args.model, batch_size=args.batch_size, persist=True)
+        count, coll = embeddings.process_and_store(input_file, chroma_persist_directory=args.chroma_dir, collection_name=args.collection, model=args.model, batch_size=args.batch_size, persist=True, quantize=args.quantize)
     except Exception as e:
         print("Failed to create embeddings:", e)
         return 3
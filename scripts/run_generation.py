@@ -7,7 +7,7 @@ import sys
 from typing import Any, Dict, List, Optional
 
 from retrieval.retriever import query_collection, build_context
-from generation.prompt import allowed_context_chars, format_sources
+from generation.prompt import allowed_context_chars, fit_context_tokens, format_sources
 # generation LLM helpers are imported lazily depending on API choice
 
 
@@ -23,8 +23,10 @@ def main() -> None:
     p.add_argument("--collection", required=True, help="Chroma collection name")
     p.add_argument("--query", required=True, help="Student's question")
     p.add_argument("--k", type=int, default=5, help="Top-k chunks to retrieve")
+    p.add_argument("--mmr", type=float, default=None, metavar="LAMBDA", help="Rerank for diversity with MMR (0..1, higher favours relevance; e.g. 0.5)")
     p.add_argument("--file-type", default=None, help="Optional filter by file_type metadata (e.g., code, markdown)")
     p.add_argument("--embed-model", default="sentence-transformers/all-MiniLM-L6-v2", help="Embedding model name for query (must match collection)")
+    p.add_argument("--embed-backend", choices=("torch", "onnx"), default=None, help="Embedding backend (default: GIST_EMBED_BACKEND or torch); must match the one used at ingestion")
 
     # LLM settings
     p.add_argument("--n-ctx", type=int, default=4096, help="Approximate LLM context size (tokens) used to trim context")
@@ -41,6 +43,8 @@ def main() -> None:
     p.add_argument("--groq-key", default=None, help="Groq API key (or set GROQ_API_KEY env var)")
 
     args = p.parse_args()
+    if args.embed_backend:
+        os.environ["GIST_EMBED_BACKEND"] = args.embed_backend
 
     where: Optional[Dict[str, Any]] = None
     if args.file_type:
@@ -54,6 +58,7 @@ def main() -> None:
         model=args.embed_model,
         k=args.k,
         where=where,
+        mmr_lambda=args.mmr,
     )
 
     if not results:
@@ -62,16 +67,16 @@ def main() -> None:
 
     # Build context trimmed to fit model context window
     ctx_chars = allowed_context_chars(args.n_ctx, args.max_tokens)
-    context_block = build_context(results, max_chars=ctx_chars)
+    context_block = fit_context_tokens(build_context(results, max_chars=ctx_chars), args.query, args.n_ctx, args.max_tokens)
 
     # Generate with Groq (only)
     groq_key = args.groq_key or os.getenv("GROQ_API_KEY")
     if not groq_key:
         print("Error: Missing Groq API key. Provide --groq-key or set GROQ_API_KEY in the environment.")
         sys.exit(2)
-    from generation.llm import generate_with_openai_compatible
+    from generation.llm import echo_stream, stream_with_openai_compatible
     groq_base = args.api_base or "https://api.groq.com/openai"
-    explanation = generate_with_openai_compatible(
+    stream = stream_with_openai_compatible(
         context_block,
         args.query,
         api_base=groq_base,
@@ -82,9 +87,9 @@ def main() -> None:
         top_p=args.top_p,
     )
 
-    # Output
+    # Output, printed as the model generates it
     print("\n=== Explanation ===\n")
-    print(explanation)
+    echo_stream(stream)
 
     if args.show_sources:
         print("\n---\nSources:\n")
@@ -7,7 +7,8 @@ This script orchestrates the Step 1 ingestion flow:
 - Retrieve a recursive file tree
 - Filter the tree to text/code files
 - Download each file and save it under the output directory while
-    preserving the repo folder structure
+    preserving the repo folder structure (or, with --mode tarball, download
+    the whole branch as one archive and keep the matching files)
 
 Notes:
 - For public repositories no token is required. For private repositories
@@ -19,12 +20,18 @@ import argparse
 import os
 import sys
 import time
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Optional, Tuple
 
 from ingest import github_client
 from ingest import utils
 
 
+def _write_file(out_path: str, text: str, path: str) -> Tuple[str, str]:
+    utils.safe_write_text(out_path, text)
+    return path, out_path
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="Ingest a GitHub repository's text files.")
     parser.add_argument("repo_url", help="GitHub repo URL, e.g. https://github.com/owner/repo")
@@ -32,6 +39,10 @@ def main(argv: list[str] | None = None) -> int:
     parser.add_argument("--token", default=None, help="GitHub personal access token (or set GITHUB_TOKEN env var)")
     parser.add_argument("--max-size", type=int, default=1_000_000, help="Max file size in bytes to fetch")
     parser.add_argument("--extensions", default=None, help="Comma-separated list of extensions to include (e.g. .py,.md)")
+    parser.add_argument("--mode", choices=("files", "tarball"), default="files",
+                        help="'files' fetches each file separately; 'tarball' downloads the branch in one request (falls back to 'files' on error)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("INGEST_CONCURRENCY", github_client.DEFAULT_FETCH_WORKERS)),
+                        help="Concurrent downloads (or set INGEST_CONCURRENCY env var)")
     args = parser.parse_args(argv)
 
     # Prefer explicit token argument, fall back to environment variable if set.
@@ -48,54 +59,124 @@ def main(argv: list[str] | None = None) -> int:
     # Query repository metadata to determine the default branch and other
     # useful information. The default branch is used when constructing raw
     # URLs for file downloads.
+    workers = max(1, args.workers)
+    # One keep-alive session for the API calls and every download
+    session = github_client.create_session(token, pool_size=workers)
     print(f"Fetching repository info for {owner}/{repo}...")
-    repo_info = github_client.get_repo_info(owner, repo, token=token)
+    repo_info = github_client.get_repo_info(owner, repo, token=token, session=session)
     branch = repo_info.get("default_branch", "main")
     print(f"Default branch: {branch}")
 
+    include_exts = None
+    if args.extensions:
+        include_exts = {ext.strip().lower() for ext in args.extensions.split(",") if ext.strip()}
+
+    out_dir = args.out
+    start = time.time()
+    saved = set()
+    # Files whose git blob sha is unchanged since the last run are not fetched
+    # again; both modes record the sha of every file they save
+    previous = github_client.load_fetch_manifest(out_dir)
+    manifest: Dict[str, str] = {}
+
+    if args.mode == "tarball":
+        # One streamed request for the whole branch; filters are applied to
+        # the archive members as they arrive.
+        print("Downloading repository tarball...")
+        try:
+            # Each file is written on a helper thread while the next member is
+            # read and decompressed; one write in flight at a time.
+            with ThreadPoolExecutor(max_workers=1) as writer:
+                pending = None
+                tarball_shas: Dict[str, str] = {}
+
+                def _written(fut) -> None:
+                    # Report a file only once its write has finished
+                    path, out_path = fut.result()
+                    saved.add(path)
+                    manifest[path] = tarball_shas.pop(path)
+                    print(f"[{len(saved)}] Saved: {path} -> {out_path} (tarball)")
+
+                for path, text, sha in github_client.iter_tarball_files(owner, repo, branch, token=token, include_exts=include_exts,
+                                                                        max_file_size=args.max_size, session=session):
+                    if utils.looks_binary(text):
+                        print(f"Skipped binary file: {path}")
+                        continue
+                    if path.lower().endswith(".ipynb"):
+                        text = github_client.extract_notebook_text(text)
+                    out_path = utils.repo_path_to_out_path(out_dir, path)
+                    if pending is not None:
+                        _written(pending)
+                    tarball_shas[path] = sha
+                    pending = writer.submit(_write_file, out_path, text, path)
+                if pending is not None:
+                    _written(pending)
+        except Exception as e:
+            # e.g. private repo without a token; fetch what is still missing file by file
+            print(f"Tarball download failed ({e}); falling back to per-file fetch.")
+        else:
+            session.close()
+            github_client.save_fetch_manifest(out_dir, manifest)
+            elapsed = time.time() - start
+            print(f"Done. Wrote {len(saved)} files to {out_dir} in {elapsed:.1f}s")
+            return 0
+
     # Retrieve a recursive git tree which contains path and size metadata for
     # each file. This is a single API call but the response may be large.
     print("Fetching file tree (this may take a moment for large repos)...")
-    tree = github_client.get_repo_tree(owner, repo, branch, token=token)
+    tree = github_client.get_repo_tree(owner, repo, branch, token=token, session=session)
     print(f"Tree entries: {len(tree)}")
 
-    include_exts = None
-    if args.extensions:
-        include_exts = {ext.strip().lower() for ext in args.extensions.split(",") if ext.strip()}
-
     # Apply extension and size filters to the tree to produce a list of
     # candidate files to download. This prevents fetching images, binaries,
     # and extremely large files which aren't useful for text embeddings.
     filtered = github_client.filter_paths(tree, include_exts=include_exts, max_file_size=args.max_size)
     print(f"Filtered files (text/code): {len(filtered)}")
 
-    out_dir = args.out
-    start = time.time()
-    # Iterate over filtered files and fetch contents one-by-one. We intentionally
-    # keep this loop synchronous to make behavior predictable; concurrency can
-    # be added later if desired for speed.
-    for idx, entry in enumerate(filtered, start=1):
-        path = entry.get("path")
-        if not path:
-            continue
-        try:
-            # Download the file content. The fetch function will try raw
-            # URLs first and fall back to the API (required for private repos).
-            text, meta = github_client.fetch_file_text(owner, repo, branch, path, token=token)
-            # For notebooks, extract the readable markdown/code into a single
-            # text blob so downstream chunking can handle it.
-            if path.lower().endswith(".ipynb"):
-                text = github_client.extract_notebook_text(text)
-            # Map the repo path to an output path that preserves folder layout
-            out_path = utils.repo_path_to_out_path(out_dir, path)
-            utils.safe_write_text(out_path, text)
-            print(f"[{idx}/{len(filtered)}] Saved: {path} -> {out_path} ({meta.get('fetched_via')})")
-        except Exception as e:
-            # Continue on errors but report them so the user can inspect failures.
-            print(f"[{idx}/{len(filtered)}] Failed to fetch {path}: {e}")
+    # Downloads are network-latency bound, so run them on a thread pool that
+    # shares one pooled keep-alive session. Progress is printed as each file
+    # completes, so the order differs from the tree order.
+    shas = {entry["path"]: entry.get("sha") for entry in filtered if entry.get("path") and entry.get("path") not in saved}
+    paths = list(shas)
+
+    def _fetch_one(path: str) -> Tuple[Optional[str], Dict]:
+        # Map the repo path to an output path that preserves folder layout
+        out_path = utils.repo_path_to_out_path(out_dir, path)
+        if github_client.read_cached_file(out_path, path, shas[path], previous) is not None:
+            return out_path, {"fetched_via": "cache"}
+        # Download the file content. The fetch function will try raw
+        # URLs first and fall back to the API (required for private repos).
+        text, meta = github_client.fetch_file_text(owner, repo, branch, path, token=token, session=session)
+        if utils.looks_binary(text):
+            # Binary content behind a text extension; not worth saving
+            return None, meta
+        # For notebooks, extract the readable markdown/code into a single
+        # text blob so downstream chunking can handle it.
+        if path.lower().endswith(".ipynb"):
+            text = github_client.extract_notebook_text(text)
+        utils.safe_write_text(out_path, text)
+        return out_path, meta
+
+    with session, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_fetch_one, path): path for path in paths}
+        for idx, fut in enumerate(as_completed(futures), start=1):
+            path = futures[fut]
+            try:
+                out_path, meta = fut.result()
+                if out_path is None:
+                    print(f"[{idx}/{len(paths)}] Skipped binary file: {path}")
+                    continue
+                saved.add(path)
+                if shas[path]:
+                    manifest[path] = shas[path]
+                print(f"[{idx}/{len(paths)}] Saved: {path} -> {out_path} ({meta.get('fetched_via')})")
+            except Exception as e:
+                # Continue on errors but report them so the user can inspect failures.
+                print(f"[{idx}/{len(paths)}] Failed to fetch {path}: {e}")
+    github_client.save_fetch_manifest(out_dir, manifest)
 
     elapsed = time.time() - start
-    print(f"Done. Wrote {len(filtered)} files to {out_dir} in {elapsed:.1f}s")
+    print(f"Done. Wrote {len(saved)} files to {out_dir} in {elapsed:.1f}s")
     return 0
 
 
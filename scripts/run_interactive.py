@@ -20,7 +20,27 @@ Secrets
 
 import os
 import sys
-from typing import Optional, Dict, Any, List
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def _ensure_paths() -> None:
+    # Ensure imports can find project modules when run directly; add each
+    # path once in case the module is imported again.
+    here = os.path.abspath(os.path.dirname(__file__))
+    root = os.path.dirname(here)
+    for path in (root, os.path.join(root, 'src')):  # scripts.* and src.* imports
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+_ensure_paths()
+
+from retrieval.retriever import build_context, get_collection, query_collection_many  # noqa: E402
+from generation.llm import echo_stream, generate_with_openai_compatible, stream_with_openai_compatible  # noqa: E402
+from generation.prompt import allowed_context_chars, fit_context_tokens, format_sources  # noqa: E402
 
 
 def _load_env() -> None:
@@ -31,6 +51,14 @@ def _load_env() -> None:
         pass
 
 
+def _enable_line_editing() -> None:
+    """Give input() arrow-key editing and history where readline exists (not on Windows)."""
+    try:
+        import readline  # type: ignore[import-not-found]  # noqa: F401
+    except ImportError:
+        pass
+
+
 def _prompt(msg: str, default: Optional[str] = None) -> str:
     suffix = f" [{default}]" if default is not None else ""
     val = input(f"{msg}{suffix}: ").strip()
@@ -54,6 +82,31 @@ def _split_csv(val: str) -> Optional[set[str]]:
     return parts or None
 
 
+def _warm_up(chroma_dir: str, collection: str, embed_model: str) -> threading.Thread:
+    """Open the collection and load the embedding model in the background.
+
+    Both are cached for the rest of the session, so this runs while the user
+    types the question and every question after it skips the load. Join the
+    returned thread before querying: the query needs the same imports, and
+    importing numpy from two threads at once can fail.
+    """
+    def _load() -> None:
+        try:
+            from ingest import embed_service, embeddings
+            get_collection(chroma_dir, collection)
+            # A live embed server already holds the model; a stale socket
+            # (or none) fails the probe and the model is loaded here
+            if embed_service.embed_remote(["warm up"], embed_model) is None:
+                embeddings.get_sbert_model(embed_model)
+        except Exception:
+            # Errors surface (with context) on the first real query instead
+            pass
+
+    thread = threading.Thread(target=_load, daemon=True)
+    thread.start()
+    return thread
+
+
 def run_ingest_chunk_embed(repo_url: str,
                            out_raw: str,
                            chunks_out: str,
@@ -87,63 +140,48 @@ def run_ingest_chunk_embed(repo_url: str,
         sys.exit(4)
 
     store_embeddings(chunks_out, chroma_dir, collection, embed_model, batch_size, use_dummy_embeddings)
-
-
-def run_retrieve_and_generate(chroma_dir: str,
-                              collection: str,
-                              query: str,
-                              *,
-                              k: int,
-                              embed_model: str,
-                              n_ctx: int,
-                              max_tokens: int,
-                              temperature: float,
-                              top_p: float,
-                              backend: str,
-                              api_base: Optional[str] = None,
-                              api_model: Optional[str] = None,
-                              api_key: Optional[str] = None,
-                              show_sources: bool = True) -> None:
-    from retrieval.retriever import query_collection, build_context
-    from generation.prompt import allowed_context_chars, format_sources
-
-    where = None  # could be extended to filter by file_type interactively
-    results = query_collection(
-        chroma_dir=chroma_dir,
-        collection_name=collection,
-        query=query,
-        model=embed_model,
-        k=k,
-        where=where,
-    )
-
-    if not results:
-        print("No results found for the query.")
-        return
-
-    ctx_chars = allowed_context_chars(n_ctx, max_tokens)
-    context_block = build_context(results, max_chars=ctx_chars)
-
+    # Answers cached for the collection before it was rewritten are stale
+    _ANSWER_CACHE.clear()
+
+
+# Answers to questions asked with temperature 0, most recent last:
+# key -> (answer, retrieval results)
+ANSWER_CACHE_SIZE = 64
+_ANSWER_CACHE: "OrderedDict[Tuple, Tuple[str, List[Dict[str, Any]]]]" = OrderedDict()
+
+
+def _make_generator(backend: str,
+                    *,
+                    max_tokens: int,
+                    temperature: float,
+                    top_p: float,
+                    stream: bool,
+                    api_base: Optional[str] = None,
+                    api_model: Optional[str] = None,
+                    api_key: Optional[str] = None) -> Optional[Callable[[str, str], Any]]:
+    """Resolve backend settings once and return fn(context_block, query).
+
+    The function returns the answer as a string, or an iterator of text
+    fragments when `stream` is set and the backend can stream (OpenAI-
+    compatible ones). Returns None if the backend is misconfigured.
+    """
     if backend == "groq":
         base = api_base or "https://api.groq.com/openai"
         key = api_key or os.getenv("GROQ_API_KEY")
         model = api_model or _prompt("Groq model", "llama-3.1-8b-instant")
         if not key:
             print("GROQ_API_KEY is required for Groq.")
-            return
-        from generation.llm import generate_with_openai_compatible
-        explanation = generate_with_openai_compatible(
-            context_block, query, api_base=base, model=model, api_key=key,
-            temperature=temperature, max_tokens=max_tokens, top_p=top_p,
-        )
+            return None
     elif backend == "hf":
         model = api_model or _prompt("HF model id", "google/gemma-2-9b-it")
         token = api_key or os.getenv("HF_TOKEN")
         if not token:
             print("HF_TOKEN is required for Hugging Face Inference API.")
-            return
-        from generation.llm import generate_with_hf_inference
-        explanation = generate_with_hf_inference(
+            return None
+        # Imported here: generation.llm has no HF client yet, and a module-level
+        # import would break the other backends too
+        from generation.llm import generate_with_hf_inference  # type: ignore[attr-defined]
+        return lambda context_block, query: generate_with_hf_inference(
             context_block, query, model=model, token=token,
             temperature=temperature, max_tokens=max_tokens, top_p=top_p,
         )
@@ -151,31 +189,127 @@ def run_retrieve_and_generate(chroma_dir: str,
         base = api_base or _prompt("API base (e.g., http://localhost:1234)")
         model = api_model or _prompt("API model id", "gpt-4o-mini")
         key = api_key or os.getenv("OPENAI_API_KEY")
-        from generation.llm import generate_with_openai_compatible
-        explanation = generate_with_openai_compatible(
-            context_block, query, api_base=base, model=model, api_key=key,
-            temperature=temperature, max_tokens=max_tokens, top_p=top_p,
-        )
     else:
         print("Unknown backend; choose groq, hf, or openai-compatible.")
+        return None
+
+    call = stream_with_openai_compatible if stream else generate_with_openai_compatible
+    return lambda context_block, query: call(
+        context_block, query, api_base=base, model=model, api_key=key,
+        temperature=temperature, max_tokens=max_tokens, top_p=top_p,
+    )
+
+
+def run_retrieve_and_generate(chroma_dir: str,
+                              collection: str,
+                              query: str,
+                              *,
+                              k: int,
+                              embed_model: str,
+                              n_ctx: int,
+                              max_tokens: int,
+                              temperature: float,
+                              top_p: float,
+                              backend: str,
+                              api_base: Optional[str] = None,
+                              api_model: Optional[str] = None,
+                              api_key: Optional[str] = None,
+                              show_sources: bool = True) -> None:
+    """Answer `query`; several `;`-separated questions are answered concurrently."""
+    queries = [q.strip() for q in query.split(";") if q.strip()]
+    if not queries:
+        print("No question entered.")
         return
 
-    print("\n=== Explanation ===\n")
-    print(explanation)
-    if show_sources:
-        print("\n---\nSources:\n")
-        for s in format_sources(results):
-            print(f"- {s}")
+    # With temperature 0 the same question gets the same answer, so repeats
+    # are served from _ANSWER_CACHE without embedding, searching or calling
+    # the LLM again.
+    cacheable = temperature == 0
+    # The record count stands in for the collection's contents: re-ingesting
+    # it (from this or another process) invalidates the cached answers.
+    try:
+        stored = get_collection(chroma_dir, collection).count() if cacheable else None
+    except Exception:
+        stored, cacheable = None, False
+    keys = [(chroma_dir, collection, stored, " ".join(q.lower().split()), k, embed_model, n_ctx, max_tokens, top_p,
+             backend, api_base, api_model) for q in queries]
+    answers: List[Any] = [None] * len(queries)
+    all_results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    for i, key in enumerate(keys):
+        if cacheable and key in _ANSWER_CACHE:
+            _ANSWER_CACHE.move_to_end(key)
+            answers[i], all_results[i] = _ANSWER_CACHE[key]
+    todo = [i for i, answer in enumerate(answers) if answer is None]
+
+    if todo:
+        where = None  # could be extended to filter by file_type interactively
+        # One embedding batch and one vector search for all questions
+        fresh = query_collection_many(
+            chroma_dir=chroma_dir,
+            collection_name=collection,
+            queries=[queries[i] for i in todo],
+            model=embed_model,
+            k=k,
+            where=where,
+        )
+        for i, results in zip(todo, fresh):
+            all_results[i] = results
+
+        # A single question streams its answer; several are generated in parallel
+        # (overlapping the LLM round trips) and printed in order.
+        generate = _make_generator(
+            backend, max_tokens=max_tokens, temperature=temperature, top_p=top_p, stream=len(todo) == 1,
+            api_base=api_base, api_model=api_model, api_key=api_key,
+        )
+        if generate is None:
+            return
 
+        ctx_chars = allowed_context_chars(n_ctx, max_tokens)
+
+        def _answer(q: str, results: List[Dict[str, Any]]) -> Any:
+            if not results:
+                return None
+            context_block = fit_context_tokens(build_context(results, max_chars=ctx_chars), q, n_ctx, max_tokens)
+            return generate(context_block, q)
+
+        if len(todo) == 1:
+            answers[todo[0]] = _answer(queries[todo[0]], all_results[todo[0]])
+        else:
+            with ThreadPoolExecutor(max_workers=len(todo)) as pool:
+                futures = {i: pool.submit(_answer, queries[i], all_results[i]) for i in todo}
+                for i, fut in futures.items():
+                    try:
+                        answers[i] = fut.result()
+                    except Exception as e:
+                        answers[i] = e
+
+    for q, key, results, answer in zip(queries, keys, all_results, answers):
+        if len(queries) > 1:
+            print(f"\n##### {q}")
+        if answer is None:
+            print("No results found for the query.")
+            continue
+        if isinstance(answer, Exception):
+            print(f"Generation failed: {answer}")
+            continue
+        print("\n=== Explanation ===\n")
+        if isinstance(answer, str):
+            print(answer)
+        else:
+            answer = echo_stream(answer)
+        if cacheable:
+            _ANSWER_CACHE[key] = (answer, results)
+            if len(_ANSWER_CACHE) > ANSWER_CACHE_SIZE:
+                _ANSWER_CACHE.popitem(last=False)
+        if show_sources:
+            print("\n---\nSources:\n")
+            for s in format_sources(results):
+                print(f"- {s}")
 
-def main() -> int:
-    # Ensure imports can find project modules when run directly
-    here = os.path.abspath(os.path.dirname(__file__))
-    root = os.path.dirname(here)
-    sys.path.insert(0, root)      # for scripts.* imports
-    sys.path.insert(0, os.path.join(root, 'src'))  # for src.* imports
 
+def main() -> int:
     _load_env()
+    _enable_line_editing()
 
     print("Interactive RAG Runner (Steps 1–5)")
     print("=================================")
@@ -231,13 +365,15 @@ def main() -> int:
             use_dummy_embeddings=use_dummy_embeddings,
         )
 
-        query = _prompt("Enter your question")
+        warm = _warm_up(chroma_dir, collection, embed_model)
+        query = _prompt("Enter your question (separate several with ';')")
 
     else:
         # Use existing collection
         chroma_dir = _prompt("Chroma DB directory", "./chroma_db")
         collection = _prompt("Chroma collection name")
-        query = _prompt("Enter your question")
+        warm = _warm_up(chroma_dir, collection, embed_model)
+        query = _prompt("Enter your question (separate several with ';')")
 
     print("\nChoose a generation backend:")
     print("  1) Groq (recommended)")
@@ -260,6 +396,7 @@ def main() -> int:
         api_model = _prompt("API model id", "gpt-4o-mini")
         api_key = os.getenv("OPENAI_API_KEY") or _prompt("API key (optional)", "") or None
 
+    warm.join()
     print("\n--- Generating answer (Step 5) ---")
     run_retrieve_and_generate(
         chroma_dir=chroma_dir,
@@ -280,7 +417,7 @@ def main() -> int:
 
     # Optionally loop for another question with same collection
     while _yes_no("Ask another question with the same collection?", False):
-        query = _prompt("Enter your question")
+        query = _prompt("Enter your question (separate several with ';')")
         run_retrieve_and_generate(
             chroma_dir=chroma_dir,
             collection=collection,
@@ -15,24 +15,30 @@ from __future__ import annotations
 
 import argparse
 import os
+import queue
 import sys
+import threading
 import time
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
 
 # No environment variables are required for local embeddings.
 
 from ingest import github_client, utils, chunker
 
 
-def ingest_repo(repo_url: str, out_dir: str, token: Optional[str], max_size: int, include_exts: Optional[set]) -> int:
-	print("\n--- STEP 1: Ingest repository ---")
+def iter_repo_files(repo_url: str, out_dir: str, token: Optional[str], max_size: int, include_exts: Optional[set],
+					workers: int = github_client.DEFAULT_FETCH_WORKERS) -> Iterator[Tuple[str, str]]:
+	"""Download a repo's text files to `out_dir`, yielding (path, text) as each one lands."""
 	owner, repo = github_client.parse_github_url(repo_url)
 	print(f"Owner: {owner}, Repo: {repo}")
-	repo_info = github_client.get_repo_info(owner, repo, token=token)
+	# One pooled keep-alive session serves the API calls and the downloads
+	session = github_client.create_session(token, pool_size=workers)
+	repo_info = github_client.get_repo_info(owner, repo, token=token, session=session)
 	branch = repo_info.get("default_branch", "main")
 	print("Default branch:", branch)
 
-	tree = github_client.get_repo_tree(owner, repo, branch, token=token)
+	tree = github_client.get_repo_tree(owner, repo, branch, token=token, session=session)
 	print(f"Tree entries: {len(tree)}")
 
 	# Use path_excludes if provided via CLI; default excludes are applied
@@ -40,22 +46,53 @@ def ingest_repo(repo_url: str, out_dir: str, token: Optional[str], max_size: int
 	print(f"Filtered files to fetch: {len(filtered)}")
 
 	utils.ensure_dir(out_dir)
-	fetched = 0
-	for idx, entry in enumerate(filtered, start=1):
-		path = entry.get("path")
-		if not path:
-			continue
-		try:
-			text, meta = github_client.fetch_file_text(owner, repo, branch, path, token=token)
-			if path.lower().endswith('.ipynb'):
-				text = github_client.extract_notebook_text(text)
-			out_path = utils.repo_path_to_out_path(out_dir, path)
-			utils.safe_write_text(out_path, text)
-			fetched += 1
-			print(f"[{idx}/{len(filtered)}] Saved: {path} -> {out_path} ({meta.get('fetched_via')})")
-		except Exception as e:
-			print(f"[{idx}/{len(filtered)}] Failed to fetch {path}: {e}")
+	shas = {entry["path"]: entry.get("sha") for entry in filtered if entry.get("path")}
+	paths = list(shas)
+	# Files whose blob sha matches the previous run are read back from disk
+	previous = github_client.load_fetch_manifest(out_dir)
+	manifest: Dict[str, str] = {}
+	# Downloads are latency-bound, so fetch them concurrently over the pooled
+	# session instead of one blocking request at a time.
+
+	def _fetch_one(path: str) -> Tuple[Optional[str], str, Dict]:
+		out_path = utils.repo_path_to_out_path(out_dir, path)
+		text = github_client.read_cached_file(out_path, path, shas[path], previous)
+		if text is not None:
+			return text, out_path, {"fetched_via": "cache"}
+		text, meta = github_client.fetch_file_text(owner, repo, branch, path, token=token, session=session)
+		if utils.looks_binary(text):
+			# Binary content behind a text extension; not worth saving or chunking
+			return None, out_path, meta
+		if path.lower().endswith('.ipynb'):
+			text = github_client.extract_notebook_text(text)
+		utils.safe_write_text(out_path, text)
+		return text, out_path, meta
+
+	try:
+		with session, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+			futures = {pool.submit(_fetch_one, path): path for path in paths}
+			for idx, fut in enumerate(as_completed(futures), start=1):
+				path = futures[fut]
+				try:
+					text, out_path, meta = fut.result()
+				except Exception as e:
+					print(f"[{idx}/{len(paths)}] Failed to fetch {path}: {e}")
+					continue
+				if text is None:
+					print(f"[{idx}/{len(paths)}] Skipped binary file: {path}")
+					continue
+				if shas[path]:
+					manifest[path] = shas[path]
+				print(f"[{idx}/{len(paths)}] Saved: {path} -> {out_path} ({meta.get('fetched_via')})")
+				yield path, text
+	finally:
+		github_client.save_fetch_manifest(out_dir, manifest)
 
+
+def ingest_repo(repo_url: str, out_dir: str, token: Optional[str], max_size: int, include_exts: Optional[set],
+				workers: int = github_client.DEFAULT_FETCH_WORKERS) -> int:
+	print("\n--- STEP 1: Ingest repository ---")
+	fetched = sum(1 for _ in iter_repo_files(repo_url, out_dir, token, max_size, include_exts, workers))
 	print(f"Ingestion complete: fetched {fetched} files to {out_dir}")
 	return fetched
 
@@ -69,11 +106,12 @@ def chunk_files(in_dir: str, repo: str, chunks_out: str, chunk_size: int, overla
 	return count
 
 
-def store_embeddings(chunks_jsonl: str, chroma_dir: str, collection: str, model: str, batch_size: int, use_dummy: bool) -> int:
+def store_embeddings(chunks_jsonl: str, chroma_dir: str, collection: str, model: str, batch_size: int, use_dummy: bool,
+					 progress: Optional[Callable[[int, int], None]] = None) -> int:
 	print("\n--- STEP 3: Embedding & Storage ---")
 	# Lazy import to avoid requiring packages earlier
 	try:
-		from ingest import embeddings
+		from ingest import embeddings, hnsw_index
 		import chromadb  # type: ignore[import-not-found]
 	except Exception as e:
 		print("Missing dependencies for embeddings or Chroma:", e)
@@ -82,55 +120,63 @@ def store_embeddings(chunks_jsonl: str, chroma_dir: str, collection: str, model:
 
 	if use_dummy:
 		print("Using dummy embeddings (--use-dummy-embeddings set)")
+		# No flat/HNSW index is built for dummy vectors; drop any left by an
+		# earlier run so queries don't search vectors the collection lost
+		embeddings.drop_search_indexes(chroma_dir, collection)
 		# Read chunks and insert dummy vectors into Chroma
 		# Prefer the modern PersistentClient which writes to disk.
 		fallback_backup = False
 		try:
 			client = chromadb.PersistentClient(path=chroma_dir)
-			try:
-				coll = client.create_collection(collection)
-			except Exception:
-				coll = client.get_collection(collection)
+			coll = embeddings.open_collection(client, collection)
 		except Exception as e:
 			print("PersistentClient failed (", e, ") — falling back to in-memory + JSONL backup.")
 			fallback_backup = True
 			client = chromadb.Client()
-			coll = client.create_collection(collection)
+			coll = client.create_collection(collection, metadata=hnsw_index.CHROMA_HNSW_METADATA)
 
 		cnt = 0
-		with open(chunks_jsonl, 'r', encoding='utf-8') as f:
-			for line in f:
-				rec = line.strip()
-				if not rec:
-					continue
-				obj = __import__('json').loads(rec)
-				meta = obj.get('metadata', {})
-				repo = meta.get('repo', '')
-				file_path = meta.get('file_path', '')
-				chunk_index = meta.get('chunk_index', 0)
-				rid = f"{repo}::{file_path}::{chunk_index}"
-				doc = obj.get('content','')
-				# Dummy embedding length 8
-				emb = [0.0]*8
+		# Stream the JSONL and insert in batches: one `coll.add` per batch keeps
+		# Chroma's per-call transaction overhead off the per-chunk path.
+		add_batch = embeddings.add_batch_size(batch_size)
+		bak_file = None
+		if fallback_backup:
+			# Write JSONL backup records containing the same data so they are
+			# recoverable if the Chroma client cannot persist to disk.
+			os.makedirs(chroma_dir, exist_ok=True)
+			bak_file = open(os.path.join(chroma_dir, "embeddings_backup.jsonl"), "ab")
+		try:
+			for batch in embeddings.batchify(embeddings.iter_jsonl_chunks(chunks_jsonl), add_batch):
+				ids, docs, metas, embs = [], [], [], []
+				for obj in batch:
+					meta = obj.get('metadata', {})
+					repo = meta.get('repo', '')
+					file_path = meta.get('file_path', '')
+					chunk_index = meta.get('chunk_index', 0)
+					ids.append(utils.chunk_id(repo, file_path, chunk_index))
+					docs.append(obj.get('content',''))
+					metas.append(meta)
+					# Dummy embedding length 8
+					embs.append([0.0]*8)
 				try:
-					if not fallback_backup:
-						coll.add(ids=[rid], documents=[doc], metadatas=[meta], embeddings=[emb])
+					if bak_file is None:
+						coll.add(ids=ids, documents=docs, metadatas=metas, embeddings=embs)
 					else:
-						# Write a JSONL backup record containing the same data so it is
-						# recoverable if the Chroma client cannot persist to disk.
-						os.makedirs(chroma_dir, exist_ok=True)
-						bak_path = os.path.join(chroma_dir, "embeddings_backup.jsonl")
-						with open(bak_path, "a", encoding="utf-8") as bf:
-							import json as _json
-							_bak = {"id": rid, "document": doc, "metadata": meta, "embedding": emb}
-							bf.write(_json.dumps(_bak, ensure_ascii=False) + "\n")
-					cnt += 1
+						bak_file.write(b"".join(
+							utils.dumps_jsonl({"id": rid, "document": doc, "metadata": meta, "embedding": emb})
+							for rid, doc, meta, emb in zip(ids, docs, metas, embs)
+						))
+					cnt += len(ids)
 				except Exception as e:
-					print('Failed to add dummy embedding for', rid, e)
+					print('Failed to add dummy embeddings for batch starting at', ids[0], e)
+		finally:
+			if bak_file is not None:
+				bak_file.close()
 		print(f"Inserted {cnt} dummy embeddings into Chroma collection '{collection}' at {chroma_dir}")
 		return cnt
 
 	# Otherwise use local Sentence-Transformers provider
+	print(f"Embedding with {model} on {embeddings.detect_device()}")
 	total, collname = embeddings.process_and_store(
 		chunks_jsonl,
 		chroma_persist_directory=chroma_dir,
@@ -138,11 +184,89 @@ def store_embeddings(chunks_jsonl: str, chroma_dir: str, collection: str, model:
 		model=model,
 		batch_size=batch_size,
 		persist=True,
+		progress=progress,
 	)
 	print(f"Inserted {total} embeddings into collection: {collname}")
 	return total
 
 
+def _in_background(items: Iterable, maxsize: int = 8) -> Iterator:
+	"""Drain `items` on a worker thread and yield them here through a bounded queue.
+
+	Lets one pipeline stage run ahead of the next (up to `maxsize` items).
+	Exceptions raised by the producer are re-raised in the consumer.
+	"""
+	buf: "queue.Queue[Tuple[bool, Any]]" = queue.Queue(maxsize=maxsize)
+	stop = threading.Event()
+
+	def _put(entry: Tuple[bool, Any]) -> bool:
+		# Poll so the producer exits if the consumer has gone away
+		while not stop.is_set():
+			try:
+				buf.put(entry, timeout=0.1)
+				return True
+			except queue.Full:
+				continue
+		return False
+
+	def _run() -> None:
+		try:
+			for item in items:
+				if not _put((False, item)):
+					return
+			_put((True, None))
+		except BaseException as e:
+			_put((True, e))
+
+	threading.Thread(target=_run, daemon=True).start()
+	try:
+		while True:
+			finished, value = buf.get()
+			if finished:
+				if value is not None:
+					raise value
+				return
+			yield value
+	finally:
+		stop.set()
+
+
+def stream_pipeline(repo_url: str, out_raw: str, chunks_out: str, chroma_dir: str, collection: str, model: str,
+					token: Optional[str], max_size: int, include_exts: Optional[set], chunk_size: int, overlap: int,
+					batch_size: int, progress: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int, int]:
+	"""Run Steps 1-3 as overlapping stages instead of one after another.
+
+	A download thread feeds a chunking thread, which feeds the embedder on
+	this thread (which in turn feeds the Chroma writer), each through a bounded
+	queue. Network, chunking and model time overlap, so the total approaches
+	the slowest stage rather than the sum. The raw files and chunk JSONL are
+	still written, exactly as the step-by-step runners produce them.
+
+	Returns (files_fetched, chunks_written, embeddings_stored).
+	"""
+	print("\n--- STEPS 1-3: Ingest, chunk and embed (streaming) ---")
+	from ingest import embeddings
+
+	slug = repo_url.replace('https://github.com/', '').rstrip('/')
+	counts = {"files": 0, "chunks": 0}
+
+	def _chunk_stream(files: Iterable[Tuple[str, str]]) -> Iterator[Dict]:
+		utils.ensure_dir(os.path.dirname(chunks_out) or ".")
+		with open(chunks_out, "wb") as out_f:
+			for path, text in files:
+				counts["files"] += 1
+				for chunk in chunker.chunk_file(text, slug, path, chunk_size_tokens=chunk_size, overlap_tokens=overlap):
+					out_f.write(utils.dumps_jsonl(chunk))
+					counts["chunks"] += 1
+					yield chunk
+
+	files = _in_background(iter_repo_files(repo_url, out_raw, token, max_size, include_exts))
+	chunks = _in_background(_chunk_stream(files))
+	total, collname = embeddings.store_chunks(chunks, chroma_dir, collection, model=model, batch_size=batch_size, progress=progress)
+	print(f"Fetched {counts['files']} files, wrote {counts['chunks']} chunks to {chunks_out}, inserted {total} embeddings into collection: {collname}")
+	return counts["files"], counts["chunks"], total
+
+
 def main(argv: Optional[list[str]] = None) -> int:
 	parser = argparse.ArgumentParser(description="Run Steps 1-3 end-to-end for a GitHub repo")
 	parser.add_argument('--repo-url', required=True, help='GitHub repo URL')
@@ -157,9 +281,12 @@ def main(argv: Optional[list[str]] = None) -> int:
 	parser.add_argument('--batch-size', type=int, default=64, help='Embedding batch size')
 	parser.add_argument('--max-size', type=int, default=1_000_000, help='Max file size in bytes to fetch')
 	parser.add_argument('--use-dummy-embeddings', action='store_true', help='Insert dummy vectors instead of computing real embeddings')
+	parser.add_argument('--device', choices=('auto', 'cpu', 'cuda', 'mps'), default=None, help='Torch device for embeddings (default: GIST_EMBED_DEVICE or auto: cuda, then mps, then cpu)')
 	parser.add_argument('--extensions', default=None, help='Comma-separated extensions to include')
 	parser.add_argument('--exclude-paths', default=None, help='Comma-separated path segments to exclude (e.g. node_modules,.cache)')
 	args = parser.parse_args(argv)
+	if args.device:
+		os.environ['GIST_EMBED_DEVICE'] = args.device
 
 	include_exts = None
 	if args.extensions:
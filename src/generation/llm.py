@@ -1,32 +1,62 @@
+"""LLM calls for the generation layer (Step 5).
+
+Sends the prompt built from retrieved context to an OpenAI-compatible Chat
+Completions endpoint (Groq, OpenAI, LM Studio, vLLM, ...) with plain
+`requests`, either as one blocking call or as a Server-Sent Events stream
+yielding the answer as it is generated. All calls share one pooled
+keep-alive session whose urllib3 retry policy covers rate limits and
+transient server errors.
+"""
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
-import time as _time
+import gzip
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import orjson  # type: ignore[import-not-found]
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
 
 from .prompt import build_system_prompt, format_user_prompt
 
+# Parses each streamed SSE event
+_loads = orjson.loads if orjson is not None else json.loads
 
-def generate_with_openai_compatible(
+# The system message never changes; build it once and share it across requests
+# (payloads are only serialized, never mutated)
+_SYSTEM_MSG: Dict[str, Any] = {"role": "system", "content": build_system_prompt()}
+# Same message as a content block marked cacheable, for providers that honour
+# `cache_control` and then reuse the prompt's prefill across questions
+_CACHED_SYSTEM_MSG: Dict[str, Any] = {
+    "role": "system",
+    "content": [{"type": "text", "text": build_system_prompt(), "cache_control": {"type": "ephemeral"}}],
+}
+
+
+def _prompt_caching_enabled(prompt_caching: Optional[bool]) -> bool:
+    """Resolve the `prompt_caching` kwarg; None defers to GIST_PROMPT_CACHE (off by default)."""
+    if prompt_caching is not None:
+        return prompt_caching
+    return (os.getenv("GIST_PROMPT_CACHE") or "").lower() in ("1", "true", "yes")
+
+
+def _build_chat_request(
     context_block: str,
     user_query: str,
     *,
     api_base: str,
     model: str,
-    api_key: Optional[str] = None,
-    temperature: float = 0.3,
-    max_tokens: int = 400,
-    top_p: float = 0.9,
-    extra_headers: Optional[Dict[str, str]] = None,
-) -> str:
-    """Call an OpenAI-compatible Chat Completions API.
-
-    Works with local servers like LM Studio or self-hosted vLLM/Ollama (when exposing
-    an OpenAI-compatible endpoint), as well as hosted providers with a key.
-    """
-    import json as _json
-    import requests as _requests
-
-    system_msg = build_system_prompt()
+    api_key: Optional[str],
+    temperature: float,
+    max_tokens: int,
+    top_p: float,
+    extra_headers: Optional[Dict[str, str]],
+    prompt_caching: Optional[bool],
+) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """Return (url, headers, payload) for an OpenAI-compatible chat completion."""
     user_msg = format_user_prompt(context_block, user_query)
 
     url = api_base.rstrip("/") + "/v1/chat/completions"
@@ -42,40 +72,199 @@ def generate_with_openai_compatible(
     payload: Dict[str, Any] = {
         "model": model,
         "messages": [
-            {"role": "system", "content": system_msg},
+            _CACHED_SYSTEM_MSG if _prompt_caching_enabled(prompt_caching) else _SYSTEM_MSG,
             {"role": "user", "content": user_msg},
         ],
         "temperature": temperature,
         "top_p": top_p,
         "max_tokens": max_tokens,
     }
-    # Simple retry on transient failures (429, 5xx)
-    attempts = 0
-    backoff = 1.0
-    while True:
-        attempts += 1
-        try:
-            resp = _requests.post(url, headers=headers, json=payload, timeout=120)
-            if resp.status_code in (429, 500, 502, 503, 504):
-                raise RuntimeError(f"HTTP {resp.status_code}: {resp.text[:500]}")
-            resp.raise_for_status()
-            break
-        except Exception as e:
-            if attempts >= 3:
-                # Include server error body to help diagnose endpoint/base/model issues
-                try:
-                    body = resp.text  # type: ignore[name-defined]
-                except Exception:
-                    body = str(e)
-                raise RuntimeError(f"OpenAI-compatible request failed after {attempts} attempts: {e}\nURL: {url}\nResponse: {body}") from e
-            _time.sleep(backoff)
-            backoff *= 2
+    return url, headers, payload
+
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_ATTEMPTS = 3
+
+# Request bodies at least this large are gzip-compressed when GIST_GZIP_REQUESTS
+# is set (not every OpenAI-compatible server accepts Content-Encoding: gzip)
+GZIP_MIN_BYTES = 1024
+
+_SESSION: Optional[Any] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _get_session() -> Any:
+    """Return the shared keep-alive Session used for every LLM call.
+
+    Follow-up questions reuse the pooled connection instead of paying a new
+    TCP/TLS handshake per request. urllib3 handles the retries, with
+    exponential backoff and honouring Retry-After on 429s.
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests as _requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(
+                    total=MAX_ATTEMPTS - 1,
+                    backoff_factor=1.0,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=None,  # chat completions are POSTs
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+                session = _requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _SESSION = session
+    return _SESSION
+
+
+def _encode_body(payload: Dict[str, Any], headers: Dict[str, str]) -> bytes:
+    """Serialize the JSON payload once, gzip-compressing it when enabled and worthwhile.
+
+    The bytes are reused as-is if urllib3 retries the request.
+
+    Retrieved code context compresses several-fold, which shortens uploads on
+    slow links. Sets Content-Encoding in `headers` when the body is compressed.
+    """
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(body) >= GZIP_MIN_BYTES and (os.getenv("GIST_GZIP_REQUESTS") or "").lower() in ("1", "true", "yes"):
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return body
+
+
+def _attempts_made(session: Any, url: str, resp: Any = None, error: Optional[BaseException] = None) -> int:
+    """Return how many times a failed request was actually sent.
+
+    A response carries urllib3's retry history. A connection error counts
+    as every configured attempt only when urllib3 gave up on it
+    (MaxRetryError); any other error happened on the first try.
+    """
+    if resp is not None:
+        retries = getattr(getattr(resp, "raw", None), "retries", None)
+        return len(getattr(retries, "history", ())) + 1
+    from urllib3.exceptions import MaxRetryError
+
+    reason = error.args[0] if error is not None and error.args else None
+    if not isinstance(reason, MaxRetryError):
+        return 1
+    total = session.get_adapter(url).max_retries.total
+    return (total if isinstance(total, int) else 0) + 1
+
+
+def _post_with_retries(url: str, headers: Dict[str, str], payload: Dict[str, Any], *, stream: bool = False) -> Any:
+    """POST the payload, retrying transient failures (429, 5xx); return the response."""
+    body = _encode_body(payload, headers)
+    session = _get_session()
+    try:
+        resp = session.post(url, headers=headers, data=body, timeout=120, stream=stream)
+    except Exception as e:
+        attempts = _attempts_made(session, url, error=e)
+        raise RuntimeError(f"OpenAI-compatible request failed after {attempts} attempt(s): {e}\nURL: {url}") from e
+    try:
+        resp.raise_for_status()
+    except Exception as e:
+        # Include server error body to help diagnose endpoint/base/model issues
+        attempts = _attempts_made(session, url, resp=resp)
+        raise RuntimeError(f"OpenAI-compatible request failed after {attempts} attempt(s): {e}\nURL: {url}\nResponse: {resp.text}") from e
+    return resp
+
+
+def generate_with_openai_compatible(
+    context_block: str,
+    user_query: str,
+    *,
+    api_base: str,
+    model: str,
+    api_key: Optional[str] = None,
+    temperature: float = 0.3,
+    max_tokens: int = 400,
+    top_p: float = 0.9,
+    extra_headers: Optional[Dict[str, str]] = None,
+    prompt_caching: Optional[bool] = None,
+) -> str:
+    """Call an OpenAI-compatible Chat Completions API.
+
+    Works with local servers like LM Studio or self-hosted vLLM/Ollama (when exposing
+    an OpenAI-compatible endpoint), as well as hosted providers with a key.
+
+    `prompt_caching=True` (or GIST_PROMPT_CACHE=1) sends the system prompt as a
+    content block marked with `cache_control`; only enable it for providers
+    that accept that field.
+    """
+    url, headers, payload = _build_chat_request(
+        context_block, user_query, api_base=api_base, model=model, api_key=api_key,
+        temperature=temperature, max_tokens=max_tokens, top_p=top_p, extra_headers=extra_headers,
+        prompt_caching=prompt_caching,
+    )
+    resp = _post_with_retries(url, headers, payload)
     data = resp.json()
     try:
         return (data["choices"][0]["message"]["content"] or "").strip()
     except Exception:
         # Fallback: return serialized response
         try:
-            return _json.dumps(data, ensure_ascii=False)[:4000]
+            return json.dumps(data, ensure_ascii=False)[:4000]
         except Exception:
             return str(data)
+
+
+def stream_with_openai_compatible(
+    context_block: str,
+    user_query: str,
+    *,
+    api_base: str,
+    model: str,
+    api_key: Optional[str] = None,
+    temperature: float = 0.3,
+    max_tokens: int = 400,
+    top_p: float = 0.9,
+    extra_headers: Optional[Dict[str, str]] = None,
+    prompt_caching: Optional[bool] = None,
+) -> Iterator[str]:
+    """Like `generate_with_openai_compatible`, but yield the answer as it is generated.
+
+    Sends `"stream": true` and parses the Server-Sent Events response, yielding
+    each `delta.content` fragment. Retries only cover establishing the response.
+    """
+    url, headers, payload = _build_chat_request(
+        context_block, user_query, api_base=api_base, model=model, api_key=api_key,
+        temperature=temperature, max_tokens=max_tokens, top_p=top_p, extra_headers=extra_headers,
+        prompt_caching=prompt_caching,
+    )
+    payload["stream"] = True
+    resp = _post_with_retries(url, headers, payload, stream=True)
+    # text/event-stream often omits a charset; the spec mandates UTF-8
+    resp.encoding = "utf-8"
+    with resp:
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                delta = _loads(data)["choices"][0].get("delta") or {}
+            except Exception:
+                continue
+            if delta.get("content"):
+                yield delta["content"]
+
+
+def echo_stream(chunks: Iterable[str]) -> str:
+    """Print streamed answer fragments as they arrive; return the full answer."""
+    parts = []
+    for piece in chunks:
+        print(piece, end="", flush=True)
+        parts.append(piece)
+    print()
+    return "".join(parts).strip()
@@ -1,18 +1,21 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 # Rough heuristic: ~4 characters per token
 TOKEN_TO_CHAR = 4
 
+SYSTEM_PROMPT = (
+    "You are a helpful assistant who explains codebases to students.\n"
+    "Focus on clarity and simple language.\n"
+    "Highlight key files, functions, and architecture decisions.\n"
+    "If something is unclear from the context, say so and suggest where to look."
+)
+
 
 def build_system_prompt() -> str:
-    return (
-        "You are a helpful assistant who explains codebases to students.\n"
-        "Focus on clarity and simple language.\n"
-        "Highlight key files, functions, and architecture decisions.\n"
-        "If something is unclear from the context, say so and suggest where to look."
-    )
+    return SYSTEM_PROMPT
 
 
 def format_user_prompt(context_block: str, user_query: str) -> str:
@@ -25,25 +28,71 @@ def format_user_prompt(context_block: str, user_query: str) -> str:
     )
 
 
-def allowed_context_chars(n_ctx: int, max_answer_tokens: int, prompt_overhead_tokens: int = 400) -> int:
+# Tokens kept free beyond the measured prompt scaffold (chat-format framing)
+PROMPT_MARGIN_TOKENS = 32
+
+
+@lru_cache(maxsize=1)
+def _token_encoding() -> Any:
+    """Return tiktoken's cl100k_base encoding, or None if tiktoken is not installed."""
+    try:
+        import tiktoken  # type: ignore[import-not-found]
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, else estimate from TOKEN_TO_CHAR."""
+    enc = _token_encoding()
+    if enc is None:
+        return -(-len(text) // TOKEN_TO_CHAR)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=64)
+def allowed_context_chars(n_ctx: int, max_answer_tokens: int, prompt_overhead_tokens: Optional[int] = None) -> int:
     """Compute an approximate character budget for the retrieved context.
 
     We reserve some tokens for the system/user prompt and the model's answer.
+    With tiktoken installed the prompt overhead is measured instead of assumed
+    to be 400 tokens; `fit_context_tokens` then enforces the exact limit.
     """
+    if prompt_overhead_tokens is None:
+        if _token_encoding() is None:
+            prompt_overhead_tokens = 400
+        else:
+            prompt_overhead_tokens = (count_tokens(SYSTEM_PROMPT) + count_tokens(format_user_prompt("", ""))
+                                      + PROMPT_MARGIN_TOKENS)
     ctx_tokens_for_context = max(256, n_ctx - max_answer_tokens - prompt_overhead_tokens)
     return max(1024, ctx_tokens_for_context * TOKEN_TO_CHAR)
 
 
+def fit_context_tokens(context_block: str, user_query: str, n_ctx: int, max_answer_tokens: int) -> str:
+    """Trim `context_block` so the full prompt fits `n_ctx` by actual token count.
+
+    The character budget assumes TOKEN_TO_CHAR characters per token, which
+    overshoots for dense code. With tiktoken installed the block is cut at
+    the exact token limit; without it the block is returned unchanged.
+    """
+    enc = _token_encoding()
+    if enc is None:
+        return context_block
+    fixed = (count_tokens(SYSTEM_PROMPT) + count_tokens(format_user_prompt("", user_query))
+             + PROMPT_MARGIN_TOKENS)
+    budget = max(256, n_ctx - max_answer_tokens - fixed)
+    tokens = enc.encode(context_block, disallowed_special=())
+    if len(tokens) <= budget:
+        return context_block
+    return enc.decode(tokens[:budget])
+
+
 def format_sources(results: List[Dict[str, Any]]) -> List[str]:
     """Create a deduplicated list of human-readable sources from retrieval results."""
-    seen = set()
-    out: List[str] = []
-    for r in results:
-        meta = (r.get("metadata") or {})
-        repo = meta.get("repo", "")
-        path = meta.get("file_path", "")
-        label = f"{repo} :: {path}" if repo else path
-        if label and label not in seen:
-            seen.add(label)
-            out.append(label)
-    return out
+    # dict.fromkeys dedups (repo, path) pairs in first-seen order; labels are
+    # only formatted once per unique source
+    keys = dict.fromkeys(
+        (meta.get("repo", ""), meta.get("file_path", ""))
+        for meta in ((r.get("metadata") or {}) for r in results)
+    )
+    return [f"{repo} :: {path}" if repo else path for repo, path in keys if repo or path]
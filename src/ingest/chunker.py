@@ -13,9 +13,9 @@ Design goals:
 """
 from __future__ import annotations
 
-import json
 import os
 import re
+from functools import lru_cache
 from typing import Dict, Iterable, List, Optional
 
 from . import utils
@@ -24,6 +24,13 @@ from . import utils
 # Approximate token -> char conversion (very rough): 1 token ~= 4 chars
 TOKEN_TO_CHAR = 4
 
+# Four or more newlines: more than two consecutive blank lines
+_BLANK_RUN_RE = re.compile(r"\n{4,}")
+# Prefixes (after indentation) of lines that start a top-level block per
+# language family (kept conservative to avoid breaking code mid-expression)
+PY_STARTERS = ("def ", "class ")
+JS_STARTERS = ("function ", "class ", "const ", "let ", "var ", "export ")
+
 
 def normalize_text(text: str) -> str:
     """Normalize whitespace and line endings.
@@ -32,28 +39,22 @@ def normalize_text(text: str) -> str:
     """
     if text is None:
         return ""
-    # Normalize CRLF to LF
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # Normalize CRLF to LF. Most files have no CR at all, and the membership
+    # test (a memchr) is far cheaper than two copying replace passes.
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
     # Strip trailing spaces on each line but preserve indentation
-    lines = [line.rstrip() for line in text.split("\n")]
-    # Collapse runs of 3+ blank lines into 2
-    out_lines = []
-    blank_run = 0
-    for line in lines:
-        if line.strip() == "":
-            blank_run += 1
-        else:
-            blank_run = 0
-        if blank_run > 2:
-            # keep at most two blank lines
-            continue
-        out_lines.append(line)
-    return "\n".join(out_lines).strip()
+    text = "\n".join([line.rstrip() for line in text.split("\n")])
+    # Collapse runs of 3+ blank lines into 2 (blank lines are empty by now, so
+    # that is any run of 4+ newlines); done in C instead of a per-line loop
+    if "\n\n\n\n" in text:
+        text = _BLANK_RUN_RE.sub("\n\n\n", text)
+    return text.strip()
 
 
-def detect_file_type(path: str) -> str:
-    """Return a simple file type string based on the path/extension."""
-    ext = os.path.splitext(path)[1].lower()
+@lru_cache(maxsize=64)
+def _type_for_ext(ext: str) -> str:
+    """Map a lowercased extension (with the dot) to a file type string."""
     if ext in {".md", ".rst"}:
         return "markdown"
     if ext in {".py", ".js", ".ts", ".java", ".go", ".rb"}:
@@ -66,6 +67,12 @@ def detect_file_type(path: str) -> str:
     return "text"
 
 
+def detect_file_type(path: str) -> str:
+    """Return a simple file type string based on the path/extension."""
+    # Repos use a handful of extensions, so the mapping is cached per suffix
+    return _type_for_ext(utils.file_ext(path))
+
+
 def chunk_by_char(text: str, chunk_size_tokens: int = 1000, overlap_tokens: int = 200) -> List[str]:
     """Chunk text by character count using a token->char heuristic.
 
@@ -78,18 +85,56 @@ def chunk_by_char(text: str, chunk_size_tokens: int = 1000, overlap_tokens: int
     if chunk_size <= 0:
         raise ValueError("chunk_size_tokens must be positive")
 
+    step = chunk_size - overlap
+    if step <= 0:
+        raise ValueError("overlap_tokens must be smaller than chunk_size_tokens")
+
+    # Window starts form an arithmetic progression; the last window is the
+    # first one reaching the end of the text. Strip once and drop empties.
+    last_start = max(len(text) - chunk_size, 0)
     chunks: List[str] = []
+    for start in range(0, last_start + step, step):
+        chunk = text[start:start + chunk_size].strip()
+        if chunk:
+            chunks.append(chunk)
+    return chunks
+
+
+def split_markdown_sections(text: str) -> List[str]:
+    """Split markdown at headers, dropping the header markers.
+
+    Same result as `re.split(r"(?m)^#{1,6}\s+", text)`: a header is 1-6 `#`
+    at the start of a line followed by whitespace, and the marker plus all the
+    whitespace after it is removed. Candidate lines are located with
+    `str.find("\n#")`, so only lines starting with `#` are examined.
+    """
+    parts: List[str] = []
+    n_text = len(text)
     start = 0
-    text_len = len(text)
-    while start < text_len:
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        if end >= text_len:
-            break
-        # advance start by chunk_size - overlap
-        start = max(0, end - overlap)
-    return [c.strip() for c in chunks if c.strip()]
+    pos = 0 if text.startswith("#") else -1
+    search_from = 0
+    while True:
+        if pos < 0:
+            i = text.find("\n#", search_from)
+            if i < 0:
+                break
+            pos = i + 1
+        # Count up to 7 leading '#': more than 6 is not a header
+        j = pos
+        while j < n_text and j - pos < 7 and text[j] == "#":
+            j += 1
+        if j - pos <= 6 and j < n_text and text[j].isspace():
+            parts.append(text[start:pos])
+            end = j + 1
+            while end < n_text and text[end].isspace():
+                end += 1
+            start = end
+            search_from = end - 1
+        else:
+            search_from = j
+        pos = -1
+    parts.append(text[start:])
+    return parts
 
 
 def split_code_by_defs(text: str, lang: str = "python") -> List[str]:
@@ -104,17 +149,11 @@ def split_code_by_defs(text: str, lang: str = "python") -> List[str]:
     blocks: List[List[str]] = []
     current: List[str] = []
 
-    # Choose a simple regex that matches common function/class starts for
-    # the language family. Keep it conservative to avoid breaking code in the
-    # middle of expressions.
-    if lang == "python":
-        starter_re = re.compile(r"^\s*(def |class )")
-    else:
-        # JS/TS/Java-like
-        starter_re = re.compile(r"^\s*(function |class |const |let |var |export )")
+    # JS/TS/Java-like for anything but Python
+    starters = PY_STARTERS if lang == "python" else JS_STARTERS
 
     for line in lines:
-        if starter_re.match(line) and current:
+        if current and line.lstrip().startswith(starters):
             # start of a new top-level block: push the current
             blocks.append(current)
             current = [line]
@@ -138,19 +177,25 @@ def chunk_file(content: str, repo: str, file_path: str, *,
     Each chunk dict has keys: 'content' and 'metadata' (repo, file_path, file_type, chunk_index)
     """
     text = normalize_text(content)
-    file_type = detect_file_type(file_path)
+    # The extension is parsed once and reused for the type and the language
+    ext = utils.file_ext(file_path)
+    file_type = _type_for_ext(ext)
     chunks: List[str] = []
 
-    if file_type == "markdown":
+    if file_type in ("text", "config") and len(text) <= chunk_size_tokens * TOKEN_TO_CHAR:
+        # Small plain-text and config files fit in one chunk; keep them
+        # whole. Markdown and code still go through their splitters so
+        # sections and definitions stay separately retrievable.
+        chunks = [text] if text else []
+    elif file_type == "markdown":
         # Split by markdown headers first, then chunk each section
-        parts = re.split(r"(?m)^#{1,6}\s+", text)
+        parts = split_markdown_sections(text)
         # Simpler approach: chunk each part conservatively
         for part in parts:
             if part.strip():
                 chunks.extend(chunk_by_char(part, chunk_size_tokens, overlap_tokens))
     elif file_type == "code":
         # Try to split by defs/classes heuristically
-        ext = os.path.splitext(file_path)[1].lower()
         lang = "python" if ext == ".py" else "js"
         code_blocks = split_code_by_defs(text, lang=lang)
         for block in code_blocks:
@@ -176,28 +221,80 @@ def chunk_file(content: str, repo: str, file_path: str, *,
     return out
 
 
+def _list_files(input_dir: str) -> List[str]:
+    """Return repo-relative paths of every file under `input_dir` (os.walk order)."""
+    rel_paths: List[str] = []
+    for root, _, files in os.walk(input_dir):
+        rel_dir = os.path.relpath(root, input_dir)
+        for fn in files:
+            rel_paths.append(os.path.join(rel_dir, fn) if rel_dir != "." else fn)
+    return rel_paths
+
+
+def chunk_one_file(input_dir: str, rel_path: str, repo: str,
+                   chunk_size_tokens: int, overlap_tokens: int) -> List[Dict]:
+    """Read and chunk one file under `input_dir`; unreadable or binary files yield no chunks.
+
+    Module-level so it can be sent to worker processes.
+    """
+    src_path = os.path.join(input_dir, rel_path)
+    try:
+        with open(src_path, "rb") as f:
+            # Sniff the head first so binary files are never read in full
+            head = f.read(utils.BINARY_SNIFF_CHARS)
+            if utils.looks_binary(head.decode("utf-8", errors="replace")):
+                return []
+            data = head + f.read()
+    except Exception:
+        # Skip files we can't read
+        return []
+    # Line endings are normalized by chunk_file, as text mode would have done
+    content = data.decode("utf-8", errors="replace")
+    return chunk_file(content, repo, rel_path, chunk_size_tokens=chunk_size_tokens, overlap_tokens=overlap_tokens)
+
+
+# Output buffer for chunk JSONL files
+WRITE_BUFFER = 1 << 20
+
+# Below this many files the process start-up cost outweighs the parallel win
+MIN_FILES_FOR_POOL = 32
+
+
 def chunk_folder(input_dir: str, repo: str, output_path: str, *,
-                 chunk_size_tokens: int = 1000, overlap_tokens: int = 200) -> int:
+                 chunk_size_tokens: int = 1000, overlap_tokens: int = 200,
+                 workers: Optional[int] = None) -> int:
     """Walk an input directory, chunk files, and write JSONL to output_path.
 
+    Splitting is CPU-bound, so files are chunked in a process pool of
+    `workers` processes (default: one per CPU) while this process remains the
+    single writer. Output order matches the serial walk. Pass `workers=1` to
+    chunk in-process.
+
     Returns the number of chunks written.
     """
+    rel_paths = _list_files(input_dir)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(rel_paths) // MIN_FILES_FOR_POOL or 1))
+
+    n = len(rel_paths)
+    args = ([input_dir] * n, rel_paths, [repo] * n, [chunk_size_tokens] * n, [overlap_tokens] * n)
+    pool = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers)
+
     count = 0
     utils.ensure_dir(os.path.dirname(output_path) or ".")
-    with open(output_path, "w", encoding="utf-8") as out_f:
-        for root, _, files in os.walk(input_dir):
-            for fn in files:
-                rel_dir = os.path.relpath(root, input_dir)
-                rel_path = os.path.join(rel_dir, fn) if rel_dir != "." else fn
-                src_path = os.path.join(root, fn)
-                try:
-                    with open(src_path, "r", encoding="utf-8", errors="replace") as f:
-                        content = f.read()
-                except Exception:
-                    # Skip files we can't read as text
-                    continue
-                chunks = chunk_file(content, repo, rel_path, chunk_size_tokens=chunk_size_tokens, overlap_tokens=overlap_tokens)
-                for chunk in chunks:
-                    out_f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
-                    count += 1
+    try:
+        # chunksize batches many small files per round trip to a worker
+        results = pool.map(chunk_one_file, *args, chunksize=max(1, n // (workers * 8))) if pool else map(chunk_one_file, *args)
+        # 1 MiB buffer and one write per file keep syscalls off the per-chunk path
+        with open(output_path, "wb", buffering=WRITE_BUFFER) as out_f:
+            for chunks in results:
+                out_f.write(b"".join(map(utils.dumps_jsonl, chunks)))
+                count += len(chunks)
+    finally:
+        if pool is not None:
+            pool.shutdown()
     return count
@@ -0,0 +1,161 @@
+"""Keep the embedding model loaded between CLI runs.
+
+Every `query_retrieval.py` / `run_generation.py` call is a fresh process that
+would otherwise reload the Sentence-Transformers model before answering. A
+long-running server (`scripts/embed_server.py`) holds the model and answers
+embedding requests over a local Unix socket; the retriever asks it first and
+falls back to loading the model in-process when no server is running.
+
+Protocol: the client sends (model_name, backend, texts) and receives
+("ok", vectors), ("error", message), or ("mismatch", server_backend) when the
+server runs a different embedding backend (the client then embeds locally).
+
+Messages are pickled, so the socket lives in a private per-user directory
+and both ends authenticate with a random key stored next to it (mode 0600)
+before anything is unpickled; sockets or keys owned by another user are
+ignored.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+import threading
+from typing import Any, List, Optional
+
+from . import embeddings
+
+log = logging.getLogger(__name__)
+
+
+def runtime_dir() -> str:
+    """Return (creating it, mode 0700) the per-user directory holding the socket."""
+    base = os.getenv("XDG_RUNTIME_DIR")
+    path = os.path.join(base, "gist") if base else os.path.join(os.path.expanduser("~"), ".cache", "gist")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    os.chmod(path, 0o700)
+    return path
+
+
+def socket_path() -> str:
+    """Socket path: GIST_EMBED_SOCKET, else `embed.sock` in `runtime_dir()`."""
+    return os.getenv("GIST_EMBED_SOCKET") or os.path.join(runtime_dir(), "embed.sock")
+
+
+def key_path(path: str) -> str:
+    """Path of the auth key file belonging to socket `path`."""
+    return path + ".key"
+
+
+def _owned_by_me(path: str, private: bool = False) -> bool:
+    """True if `path` exists, belongs to this user and (if `private`) has no group/other bits."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if st.st_uid != os.getuid():
+        return False
+    return not (private and st.st_mode & 0o077)
+
+
+def _read_key(path: str) -> Optional[bytes]:
+    kpath = key_path(path)
+    if not _owned_by_me(kpath, private=True):
+        return None
+    try:
+        with open(kpath, "rb") as f:
+            return f.read() or None
+    except OSError:
+        return None
+
+
+def embed_remote(texts: List[str], model: str) -> Optional[List[List[float]]]:
+    """Embed `texts` via a running embed server, or return None if there is none."""
+    if not hasattr(os, "fork"):
+        # No Unix sockets on Windows
+        return None
+    path = socket_path()
+    if not _owned_by_me(path):
+        # No server started, or a socket planted by another user
+        return None
+    authkey = _read_key(path)
+    if authkey is None:
+        return None
+    try:
+        from multiprocessing import AuthenticationError
+        from multiprocessing.connection import Client
+
+        with Client(path, family="AF_UNIX", authkey=authkey) as conn:
+            conn.send((model, embeddings.embed_backend(), list(texts)))
+            status, payload = conn.recv()
+    except (OSError, EOFError, AuthenticationError) as e:
+        log.debug("Embed server at %s unavailable: %s", path, e)
+        return None
+    if status == "mismatch":
+        log.debug("Embed server uses the %s backend; embedding locally", payload)
+        return None
+    if status != "ok":
+        raise RuntimeError(f"Embed server error: {payload}")
+    return payload
+
+
+def _handle(conn: Any, lock: threading.Lock) -> None:
+    with conn:
+        try:
+            model, backend, texts = conn.recv()
+            if backend != embeddings.embed_backend():
+                conn.send(("mismatch", embeddings.embed_backend()))
+                return
+            with lock:
+                vecs = embeddings.embed_texts_sbert(texts, model=model)
+            conn.send(("ok", vecs))
+        except EOFError:
+            pass
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+def serve(models: List[str], path: Optional[str] = None) -> None:
+    """Load `models` and answer embedding requests on `path` until interrupted."""
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Listener
+
+    path = path or socket_path()
+    try:
+        import torch  # type: ignore[import-not-found]
+        # Use every core for the (single) model instead of torch's default
+        torch.set_num_threads(os.cpu_count() or 1)
+    except Exception:
+        pass
+    for model in models:
+        embeddings.embed_texts_sbert(["warm up"], model=model)
+
+    for stale in (path, key_path(path)):
+        if os.path.exists(stale):
+            os.remove(stale)
+    authkey = secrets.token_bytes(32)
+    fd = os.open(key_path(path), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(authkey)
+    # One model instance is shared; encode calls are serialized
+    lock = threading.Lock()
+    # Create the socket owner-only from the start (no window before a chmod)
+    old_umask = os.umask(0o177)
+    try:
+        listener = Listener(path, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(old_umask)
+    with listener:
+        log.info("Embed server listening on %s", path)
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, EOFError):
+                    log.warning("Rejected an embed client that failed authentication")
+                    continue
+                threading.Thread(target=_handle, args=(conn, lock), daemon=True).start()
+        finally:
+            for p in (path, key_path(path)):
+                if os.path.exists(p):
+                    os.remove(p)
@@ -9,141 +9,561 @@ Usage notes:
 from __future__ import annotations
 
 import json
+import mmap
 import os
-import time
-from typing import Dict, Iterable, List, Optional, Tuple, Any
+import queue
+import threading
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Any
 
-# No environment variable loading required for local embeddings.
+from . import flat_index, hnsw_index, utils
+
+# Records embedded per batch during ingestion (and inserted per call by the
+# dummy-embedding path). Chroma commits each `collection.add` as its own
+# SQLite transaction, so even the smallest inserts should carry 100-250
+# records. Override with the CHROMA_ADD_BATCH environment variable.
+DEFAULT_ADD_BATCH = 200
+
+# Consecutive batches are merged into one `collection.add` of up to this
+# many records by the ingestion writer thread.
+WRITE_ROWS = 5000
+
+
+def add_batch_size(batch_size: Optional[int] = None) -> int:
+    """Return the number of records to embed (and hand to the writer) per batch.
+
+    A positive integer in CHROMA_ADD_BATCH takes precedence, then `batch_size`,
+    then DEFAULT_ADD_BATCH.
+    """
+    env_val = os.getenv("CHROMA_ADD_BATCH")
+    if env_val:
+        try:
+            parsed = int(env_val)
+            if parsed > 0:
+                return parsed
+        except ValueError:
+            pass
+    if batch_size and batch_size > 0:
+        return batch_size
+    return DEFAULT_ADD_BATCH
+
+
+def iter_jsonl_chunks(path: str) -> Iterator[Dict]:
+    """Yield chunk dicts from a chunker JSONL file one line at a time."""
+    # Read bytes: orjson parses them directly without a str decode step. The
+    # file is memory-mapped so lines come straight out of the page cache.
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return
+        with mm:
+            for line in iter(mm.readline, b""):
+                line = line.strip()
+                if not line:
+                    continue
+                yield utils.loads_json(line)
 
 
 def load_jsonl_chunks(path: str) -> List[Dict]:
     """Read a JSONL file produced by the chunker and return a list of chunk dicts."""
-    out: List[Dict] = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            out.append(json.loads(line))
-    return out
+    # One read and one split beat the line-by-line generator when every
+    # record is needed anyway; orjson (via utils.loads_json) parses the bytes
+    # directly and tolerates surrounding whitespace, so only blank lines are
+    # skipped.
+    with open(path, "rb") as f:
+        data = f.read()
+    return [utils.loads_json(line) for line in data.splitlines() if line and not line.isspace()]
 
 
 # OpenAI integration removed; using Sentence-Transformers only.
 
 
+# Sentences per forward pass. Larger batches keep the GPU busy; on CPU the
+# cost is only a little extra memory.
+ENCODE_BATCH = 256
+
 _SBERT_MODEL_CACHE: Dict[str, Any] = {}
+# Held while loading so concurrent first calls share one model instance
+_SBERT_MODEL_LOCK = threading.Lock()
 
-def embed_texts_sbert(texts: List[str], model: str = "sentence-transformers/all-MiniLM-L6-v2") -> List[List[float]]:
-    """Embed texts using a local Sentence-Transformers model.
+# "torch" runs the regular PyTorch model; "onnx" runs an int8-quantized ONNX
+# export through ONNX Runtime (CPU), which is several times faster on
+# machines without a GPU. Select with the GIST_EMBED_BACKEND environment
+# variable. Use the same backend for ingestion and queries.
+EMBED_BACKENDS = ("torch", "onnx")
 
-    Returns a list of vector lists (floats) in the same order as `texts`.
+# Exported/quantized ONNX models are kept here after the first use
+ONNX_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gist", "onnx")
+
+
+# Values accepted by the CLIs' --device flag
+EMBED_DEVICES = ("auto", "cpu", "cuda", "mps")
+
+
+def detect_device() -> str:
+    """Return the best torch device: 'cuda', then Apple-silicon 'mps', else 'cpu'.
+
+    The GIST_EMBED_DEVICE environment variable overrides the detection
+    (unless it is "auto").
+    """
+    forced = os.getenv("GIST_EMBED_DEVICE")
+    if forced and forced.lower() != "auto":
+        return forced
+    try:
+        import torch  # type: ignore[import-not-found]
+        if torch.cuda.is_available():
+            return "cuda"
+        mps = getattr(torch.backends, "mps", None)
+        if mps is not None and mps.is_available():
+            return "mps"
+    except Exception:
+        pass
+    return "cpu"
+
+
+def embed_backend() -> str:
+    """Return the configured embedding backend (GIST_EMBED_BACKEND, default "torch")."""
+    backend = (os.getenv("GIST_EMBED_BACKEND") or "torch").lower()
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"GIST_EMBED_BACKEND must be one of {EMBED_BACKENDS}, got {backend!r}")
+    return backend
+
+
+def _load_onnx_model(model: str) -> Any:
+    """Return `model` as an int8 ONNX Runtime model, exporting it on first use."""
+    import platform
+
+    from sentence_transformers import SentenceTransformer
+    try:
+        from sentence_transformers.backend import export_dynamic_quantized_onnx_model
+    except Exception as e:
+        raise RuntimeError("The ONNX backend needs a newer sentence-transformers. Install with `pip install -U \"sentence-transformers[onnx]\"`.") from e
+
+    config = "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx2"
+    file_name = f"onnx/model_qint8_{config}.onnx"
+    local_dir = os.path.join(ONNX_CACHE_DIR, model.replace("/", "__"))
+    try:
+        if not os.path.exists(os.path.join(local_dir, file_name)):
+            # First use: export to ONNX, then quantize the weights to int8
+            exported = SentenceTransformer(model, device="cpu", backend="onnx")
+            exported.save_pretrained(local_dir)
+            export_dynamic_quantized_onnx_model(exported, config, local_dir)
+        return SentenceTransformer(local_dir, device="cpu", backend="onnx", model_kwargs={"file_name": file_name})
+    except ImportError as e:
+        raise RuntimeError("The ONNX backend requires `optimum` and `onnxruntime`. Install with `pip install \"sentence-transformers[onnx]\"`.") from e
+
+
+def get_sbert_model(model: str) -> Any:
+    """Load (once) and return a Sentence-Transformers model on the best device.
+
+    With GIST_EMBED_BACKEND=onnx the int8 ONNX export is returned instead; it
+    exposes the same `encode` interface.
     """
     try:
         from sentence_transformers import SentenceTransformer
-        import numpy as _np
     except Exception as e:
         raise RuntimeError("The `sentence-transformers` package is required. Install with `pip install sentence-transformers`.") from e
 
+    backend = embed_backend()
+    key = f"{model}#onnx" if backend == "onnx" else model
     # Cache model instance across calls
-    if model not in _SBERT_MODEL_CACHE:
-        _SBERT_MODEL_CACHE[model] = SentenceTransformer(model)
-    st_model = _SBERT_MODEL_CACHE[model]
-    # Encode returns numpy arrays; convert to Python lists of floats
-    vecs = st_model.encode(texts, batch_size=max(8, min(64, len(texts))), convert_to_numpy=True, normalize_embeddings=False)
-    if hasattr(vecs, 'tolist'):
-        return vecs.tolist()
-    # Fallback if it returns list of arrays
-    return [(_v.tolist() if hasattr(_v, 'tolist') else list(_v)) for _v in vecs]
+    cached = _SBERT_MODEL_CACHE.get(key)
+    if cached is not None:
+        return cached
+    with _SBERT_MODEL_LOCK:
+        if key not in _SBERT_MODEL_CACHE:
+            if backend == "onnx":
+                _SBERT_MODEL_CACHE[key] = _load_onnx_model(model)
+            else:
+                device = detect_device()
+                st_model = SentenceTransformer(model, device=device)
+                if device in ("cuda", "mps"):
+                    # FP16 halves memory bandwidth and uses the GPU's fast
+                    # half-precision units; on CPU it would be slower
+                    st_model = st_model.half()
+                _SBERT_MODEL_CACHE[key] = st_model
+        return _SBERT_MODEL_CACHE[key]
+
+
+# Chunks embedded in-process before ingestion starts one encoding worker per
+# GPU (see `encode_devices`); below this, loading the extra model copies
+# costs more than it saves.
+MULTI_PROCESS_MIN_CHUNKS = 4096
+
+
+def encode_devices() -> List[str]:
+    """Return the CUDA devices to encode on in parallel, or [] when there is only one.
+
+    Only the torch backend on an auto-detected CUDA device qualifies; pinning
+    a device with GIST_EMBED_DEVICE opts out, and a single device already
+    runs at full speed in-process.
+    """
+    forced = os.getenv("GIST_EMBED_DEVICE")
+    if forced and forced.lower() != "auto":
+        return []
+    if embed_backend() != "torch" or detect_device() != "cuda":
+        return []
+    try:
+        import torch  # type: ignore[import-not-found]
+        count = torch.cuda.device_count()
+    except Exception:
+        return []
+    return [f"cuda:{i}" for i in range(count)] if count > 1 else []
+
+
+def start_encode_pool(model: str, devices: List[str]) -> Any:
+    """Start a multi-process encode pool over `devices` for `model`.
+
+    The pool is started from its own CPU instance: starting it moves the
+    model to CPU, which must not happen to the cached (GPU, FP16) model that
+    single-process encodes and queries keep using.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model, device="cpu").start_multi_process_pool(devices)
+
+
+def encode_sbert(texts: List[str], model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 batch_size: int = ENCODE_BATCH, pool: Any = None) -> Any:
+    """Embed texts and return an (n, dim) float32 numpy matrix of L2-normalized rows.
+
+    `pool` is an optional sentence-transformers multi-process pool (from
+    `start_multi_process_pool`); the texts are then split evenly across its
+    workers.
+    """
+    import numpy as np
+
+    st_model = get_sbert_model(model)
+    if pool is not None:
+        workers = max(1, len(pool["processes"]))
+        vecs = np.asarray(st_model.encode_multi_process(texts, pool, batch_size=batch_size,
+                                                        chunk_size=-(-len(texts) // workers)),
+                          dtype=np.float32)
+        # encode_multi_process does not normalize on older sentence-transformers
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vecs / norms
+    on_gpu = not str(getattr(st_model, "device", "cpu")).startswith("cpu")
+    vecs = st_model.encode(
+        texts,
+        batch_size=max(1, min(batch_size, len(texts))),
+        show_progress_bar=False,
+        # On a GPU keep the batches on the device and copy the result back
+        # once, instead of one device->host transfer per batch
+        convert_to_tensor=on_gpu,
+        convert_to_numpy=not on_gpu,
+        normalize_embeddings=True,
+    )
+    if on_gpu:
+        # Cast FP16 output while still on the device
+        return vecs.float().cpu().numpy()
+    return np.asarray(vecs, dtype=np.float32)
+
+
+def embed_texts_sbert(texts: List[str], model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                      batch_size: int = ENCODE_BATCH) -> List[List[float]]:
+    """Embed texts using a local Sentence-Transformers model.
+
+    Vectors are L2-normalized and computed in float32 (float16 on a GPU).
+    Returns a list of vector lists (floats) in the same order as `texts`.
+    """
+    return encode_sbert(texts, model=model, batch_size=batch_size).tolist()
+
+
+def chroma_accepts_numpy() -> bool:
+    """Return True if the installed chromadb takes numpy embedding matrices (0.5+)."""
+    try:
+        import chromadb  # type: ignore[import-not-found]
+        major, minor = (int(p) for p in chromadb.__version__.split(".")[:2])
+    except Exception:
+        return False
+    return (major, minor) >= (0, 5)
+
+
+def drop_search_indexes(chroma_dir: str, collection_name: str) -> None:
+    """Delete the flat/HNSW side indexes saved for a collection.
+
+    The retriever prefers those files over Chroma, so any write to the
+    collection that does not end in a rebuild must drop them first; otherwise
+    queries would search vectors the collection no longer holds.
+    """
+    flat_index.remove_flat_index(chroma_dir, collection_name)
+    hnsw_index.remove_hnsw_index(chroma_dir, collection_name)
+
+
+def open_collection(client: Any, collection_name: str) -> Any:
+    """Create the Chroma collection, or open the existing one.
+
+    Collections written before ids became `utils.chunk_id` hashes hold
+    "repo::path::index" ids; new writes would never upsert over those, so
+    every chunk would be stored twice. Such a collection is dropped and
+    recreated empty.
+    """
+    try:
+        return client.create_collection(name=collection_name, metadata=hnsw_index.CHROMA_HNSW_METADATA)
+    except Exception:
+        collection = client.get_collection(name=collection_name)
+    if any("::" in old_id for old_id in collection.peek(1)["ids"]):
+        import logging
+        logging.getLogger(__name__).warning(
+            "Collection %s uses the old chunk id format; recreating it", collection_name)
+        client.delete_collection(name=collection_name)
+        collection = client.create_collection(name=collection_name, metadata=hnsw_index.CHROMA_HNSW_METADATA)
+    return collection
 
 
 def batchify(iterable: Iterable, batch_size: int):
-    batch = []
-    for item in iterable:
-        batch.append(item)
-        if len(batch) >= batch_size:
-            yield batch
-            batch = []
-    if batch:
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
         yield batch
 
 
+# Batches gathered and length-sorted together by `length_bucketed` when the
+# whole chunk file is already on disk (`process_and_store`)
+BUCKET_BATCHES = 50
+# Window used by `store_chunks` by default: its records may still be arriving
+# from the fetch/chunk stages, and a large window would hold back the first
+# encode until thousands of chunks (often the whole repo) have been produced
+STREAM_BUCKET_BATCHES = 2
+
+
+def length_bucketed(records: Iterable[Tuple[int, Dict]], batch_size: int,
+                    bucket_batches: int = BUCKET_BATCHES) -> Iterator[List[Tuple[int, Dict]]]:
+    """Batch (index, chunk) pairs so each batch holds chunks of similar length.
+
+    The model pads every text in a batch to the longest one, so mixing short
+    config snippets with full-size code chunks wastes most of the compute.
+    Records are read `bucket_batches` batches at a time, sorted by content
+    length within that window and re-batched; no global sort is needed, and
+    at most `batch_size * bucket_batches` records are held (and nothing is
+    yielded until that many have arrived). Callers key rows by id, so order
+    is not preserved.
+    """
+    for window in batchify(records, batch_size * bucket_batches):
+        window.sort(key=lambda item: len(item[1].get("content", "")))
+        yield from batchify(window, batch_size)
+
+
 def process_and_store(jsonl_path: str,
                       chroma_persist_directory: str = "./chroma_db",
                       collection_name: str = "repo_embeddings",
                       model: str = "sentence-transformers/all-MiniLM-L6-v2",
                       batch_size: int = 64,
-                      persist: bool = True) -> Tuple[int, str]:
+                      persist: bool = True,
+                      progress: Optional[Callable[[int, int], None]] = None,
+                      quantize: str = "int8") -> Tuple[int, str]:
     """Main entry: read chunks, embed them in batches, and store in Chroma.
 
+    See `store_chunks` for how embedding and insertion overlap.
+
+    Returns (count_of_embeddings, collection_name).
+    """
+    # The file is complete, so a wide sort window costs no latency
+    return store_chunks(iter_jsonl_chunks(jsonl_path), chroma_persist_directory, collection_name,
+                        model=model, batch_size=batch_size, progress=progress, quantize=quantize,
+                        bucket_batches=BUCKET_BATCHES)
+
+
+def store_chunks(records: Iterable[Dict],
+                 chroma_persist_directory: str = "./chroma_db",
+                 collection_name: str = "repo_embeddings",
+                 model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 batch_size: int = 64,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 quantize: str = "int8",
+                 bucket_batches: int = STREAM_BUCKET_BATCHES) -> Tuple[int, str]:
+    """Embed chunk dicts from any iterable in batches and store them in Chroma.
+
+    Embedding runs on the calling thread while a writer thread inserts the
+    previous batches, so total time is roughly max(embed, insert) rather than
+    their sum. `records` is consumed lazily, so it may itself be fed by a
+    still-running download/chunking stage; `bucket_batches` (see
+    `length_bucketed`) is kept small by default so embedding starts after a
+    couple of batches rather than after the whole stream. `progress`, if
+    given, is called on the calling thread after each batch with
+    (chunks_embedded, chunks_stored).
+    `quantize` selects the storage format of the exact-search matrix
+    (see flat_index.QUANTIZE_CHOICES). With several GPUs, batches after the
+    first MULTI_PROCESS_MIN_CHUNKS chunks are encoded by one worker process
+    per GPU.
+
     Returns (count_of_embeddings, collection_name).
     """
+    if quantize not in flat_index.QUANTIZE_CHOICES:
+        raise ValueError(f"quantize must be one of {flat_index.QUANTIZE_CHOICES}, got {quantize!r}")
     # Lazy import chromadb to provide an informative error if missing
     try:
         import chromadb  # type: ignore[import-not-found]
     except Exception as e:
         raise RuntimeError("The `chromadb` package is required. Install with `pip install chromadb`.") from e
 
-    chunks = load_jsonl_chunks(jsonl_path)
-    total = 0
-
     # Prepare Chroma client and collection.
     # Prefer the modern PersistentClient which writes to disk at the given path.
     # If that fails (e.g., due to environment issues), fall back to in-memory client
     # and write a JSONL backup so embeddings are not lost.
     fallback_backup = False
+    # Side indexes from an earlier run are stale as soon as the collection
+    # changes; they are rebuilt below only if ingestion completes normally
+    drop_search_indexes(chroma_persist_directory, collection_name)
     try:
         client = chromadb.PersistentClient(path=chroma_persist_directory)
-        try:
-            collection = client.create_collection(name=collection_name)
-        except Exception:
-            collection = client.get_collection(name=collection_name)
+        collection = open_collection(client, collection_name)
     except Exception as e:
         import logging
         logging.getLogger(__name__).warning("PersistentClient failed (%s); falling back to in-memory client and JSONL backup at %s", e, chroma_persist_directory)
         fallback_backup = True
         client = chromadb.Client()
-        collection = client.create_collection(name=collection_name)
-
-    ids: List[str] = []
-    metadatas: List[Dict] = []
-    docs: List[str] = []
-    embeddings_all: List[List[float]] = []
-
-    # Prepare records: id, doc, metadata
-    for idx, rec in enumerate(chunks):
-        meta = rec.get("metadata", {})
-        repo = meta.get("repo", "")
-        file_path = meta.get("file_path", "")
-        chunk_index = meta.get("chunk_index", idx)
-        # deterministic id
-        rid = f"{repo}::{file_path}::{chunk_index}"
-        ids.append(rid)
-        metadatas.append(meta)
-        docs.append(rec.get("content", ""))
-
-    # Batch embedding + insert to avoid memory spikes
-    for batch_idx, doc_batch in enumerate(batchify(list(zip(ids, docs, metadatas)), batch_size)):
-        batch_ids, batch_docs, batch_metas = zip(*doc_batch)
-        texts = list(batch_docs)
-        # Obtain embeddings via local Sentence-Transformers
-        # If a non-sbert name was passed, default to MiniLM
-        if not (model.startswith("sentence-transformers/") or model == "all-MiniLM-L6-v2"):
-            model = "sentence-transformers/all-MiniLM-L6-v2"
-        embeddings = embed_texts_sbert(texts, model=model)
+        collection = client.create_collection(name=collection_name, metadata=hnsw_index.CHROMA_HNSW_METADATA)
+
+    # If a non-sbert name was passed, default to MiniLM
+    if not (model.startswith("sentence-transformers/") or model == "all-MiniLM-L6-v2"):
+        model = "sentence-transformers/all-MiniLM-L6-v2"
+
+    # Bounded queue: the embedder can run at most a few batches ahead of the
+    # writer, which keeps memory flat when inserts are the slower side.
+    pending: "queue.Queue[Optional[Tuple[List[str], List[str], List[Dict], Any]]]" = queue.Queue(maxsize=4)
+    stored = [0]
+    errors: List[BaseException] = []
+    # Rows for the exact-search matrix (see flat_index); dropped once the
+    # collection grows past the size where brute force pays off.
+    index_ids: List[str] = []
+    index_parts: List[Any] = []
+    keep_index = [not fallback_backup]
+    # Set once the collection outgrows exact search and hnswlib is installed
+    hnsw: List[Optional[hnsw_index.HnswBuilder]] = [None]
+
+    # Rows per `collection.add`: embedding batches are merged up to this size
+    # so Chroma commits (and updates its index) a few times per repo rather
+    # than once per embedding batch. Capped by the backend's own limit.
+    write_rows = WRITE_ROWS
+    try:
+        write_rows = min(write_rows, int(client.get_max_batch_size()))
+    except Exception:
+        pass
+
+    # Embeddings stay float32 numpy rows end to end; recent Chroma versions take
+    # the matrix as is, older ones get one tolist() per insert.
+    pass_numpy = chroma_accepts_numpy()
+
+    def _flush(batch_ids: List[str], batch_docs: List[str], batch_metas: List[Dict], embeddings: Any) -> None:
+        import numpy as _np
         # Add to Chroma collection (or write backup if persistent backend unavailable)
         if not fallback_backup:
-            collection.add(ids=list(batch_ids), documents=list(batch_docs), metadatas=list(batch_metas), embeddings=embeddings)
-            total += len(batch_docs)
+            collection.add(ids=batch_ids, documents=batch_docs, metadatas=batch_metas,
+                           embeddings=embeddings if pass_numpy else embeddings.tolist())
         else:
             # Write backup records to a JSONL file so vectors are not lost
             os.makedirs(chroma_persist_directory, exist_ok=True)
             bak_path = os.path.join(chroma_persist_directory, "embeddings_backup.jsonl")
             with open(bak_path, "a", encoding="utf-8") as bf:
-                for _id, _doc, _meta, _emb in zip(batch_ids, batch_docs, batch_metas, embeddings):
+                for _id, _doc, _meta, _emb in zip(batch_ids, batch_docs, batch_metas, embeddings.tolist()):
                     bf.write(json.dumps({"id": _id, "document": _doc, "metadata": _meta, "embedding": _emb}, ensure_ascii=False) + "\n")
-            total += len(batch_docs)
         # No explicit persist() required with PersistentClient; it manages on-disk state.
-        # small sleep to avoid bursting API too fast in some environments
-        time.sleep(0.01)
+        stored[0] += len(batch_ids)
+        if keep_index[0]:
+            if len(index_ids) + len(batch_ids) > flat_index.MAX_FLAT_ROWS:
+                keep_index[0] = False
+                if hnsw_index.available():
+                    # Too big for exact search: move the rows gathered so
+                    # far into an HNSW graph and keep building that instead
+                    hnsw[0] = hnsw_index.HnswBuilder(embeddings.shape[1])
+                    if index_parts:
+                        hnsw[0].add(index_ids, _np.concatenate(index_parts))
+                index_ids.clear()
+                index_parts.clear()
+            else:
+                index_ids.extend(batch_ids)
+                index_parts.append(embeddings)
+        if hnsw[0] is not None:
+            hnsw[0].add(batch_ids, embeddings)
+
+    def _writer() -> None:
+        import numpy as _np
+        ids: List[str] = []
+        docs: List[str] = []
+        metas: List[Dict] = []
+        # Embedding matrices are kept whole and joined once per flush rather
+        # than split into per-row objects
+        mats: List[Any] = []
+        while True:
+            item = pending.get()
+            if errors:
+                # Keep draining so the producer never blocks on a dead writer
+                if item is None:
+                    return
+                continue
+            if item is not None:
+                ids.extend(item[0])
+                docs.extend(item[1])
+                metas.extend(item[2])
+                mats.append(item[3])
+                if len(ids) < write_rows:
+                    continue
+            try:
+                if ids:
+                    mat = mats[0] if len(mats) == 1 else _np.concatenate(mats)
+                    for start in range(0, len(ids), write_rows):
+                        end = start + write_rows
+                        _flush(ids[start:end], docs[start:end], metas[start:end], mat[start:end])
+            except BaseException as e:
+                errors.append(e)
+            ids, docs, metas, mats = [], [], [], []
+            if item is None:
+                return
+
+    writer = threading.Thread(target=_writer, name="chroma-writer", daemon=True)
+    writer.start()
+
+    # Stream records and embed + insert batch by batch. Held records are
+    # bounded by the bucket window (batch size * bucket_batches) plus the
+    # writer's merge buffer, not by the repo size.
+    embedded = 0
+    # Started once the corpus proves large enough (see MULTI_PROCESS_MIN_CHUNKS)
+    devices = encode_devices()
+    pool = None
+    try:
+        for batch in length_bucketed(enumerate(records), add_batch_size(batch_size), bucket_batches):
+            if errors:
+                break
+            batch_ids: List[str] = []
+            batch_docs: List[str] = []
+            batch_metas: List[Dict] = []
+            for idx, rec in batch:
+                meta = rec.get("metadata", {})
+                repo = meta.get("repo", "")
+                file_path = meta.get("file_path", "")
+                chunk_index = meta.get("chunk_index", idx)
+                # deterministic id
+                batch_ids.append(utils.chunk_id(repo, file_path, chunk_index))
+                batch_metas.append(meta)
+                batch_docs.append(rec.get("content", ""))
+            # Obtain embeddings via local Sentence-Transformers
+            if pool is None and devices and embedded >= MULTI_PROCESS_MIN_CHUNKS:
+                pool = start_encode_pool(model, devices)
+            embeddings = encode_sbert(batch_docs, model=model, pool=pool)
+            pending.put((batch_ids, batch_docs, batch_metas, embeddings))
+            embedded += len(batch_ids)
+            if progress is not None:
+                progress(embedded, stored[0])
+    finally:
+        pending.put(None)
+        writer.join()
+        if pool is not None:
+            get_sbert_model(model).stop_multi_process_pool(pool)
+    if errors:
+        raise errors[0]
 
+    total = stored[0]
+    if not fallback_backup:
+        if keep_index[0] and index_parts:
+            import numpy as _np
+            flat_index.save_flat_index(chroma_persist_directory, collection_name, index_ids, _np.concatenate(index_parts),
+                                       quantize=quantize)
+        if hnsw[0] is not None:
+            hnsw[0].save(chroma_persist_directory, collection_name)
     return total, collection_name
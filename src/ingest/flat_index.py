@@ -0,0 +1,178 @@
+"""Exact (brute-force) vector search for small collections.
+
+For typical repositories (tens of thousands of chunks or fewer) a single
+matrix product over all normalized embeddings is faster than Chroma's HNSW
+query path. Step 3 writes the matrix next to the Chroma database and the
+retriever (Step 4) searches it whenever it still matches the collection.
+
+Files written per collection under the Chroma directory:
+- `<collection>.flat.npy`       one L2-normalized row per chunk, stored as int8
+                                scaled by INT8_SCALE (4x smaller than float32)
+                                or, with quantize="none", as float32
+- `<collection>.flat_ids.json`  the Chroma ids of those rows, in order
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Collections larger than this keep using Chroma's approximate index
+MAX_FLAT_ROWS = 100_000
+
+# Rows are unit vectors, so every component lies in [-1, 1] and one global
+# scale maps them onto the int8 range without per-row factors.
+INT8_SCALE = 127.0
+
+# Storage formats accepted by save_flat_index
+QUANTIZE_CHOICES = ("int8", "none")
+
+# Rows dequantized per matmul: bounds the float32 scratch to a few MB while
+# keeping the product on the BLAS path.
+_SCORE_BLOCK = 8192
+
+# vectors path -> (mtime, (ids, matrix))
+_INDEX_CACHE: Dict[str, Tuple[float, Tuple[List[str], Any]]] = {}
+
+
+def _index_paths(chroma_dir: str, collection: str) -> Tuple[str, str]:
+    base = os.path.join(chroma_dir, collection)
+    return base + ".flat.npy", base + ".flat_ids.json"
+
+
+def _normalize_rows(mat: Any) -> Any:
+    import numpy as np
+
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def _quantize_rows(mat: Any) -> Any:
+    import numpy as np
+
+    return np.clip(np.round(mat * INT8_SCALE), -127, 127).astype(np.int8)
+
+
+def _cosine_scores(mat: Any, q: Any) -> Any:
+    """Return (n_queries, n_rows) cosine scores for normalized float32 queries."""
+    import numpy as np
+
+    if mat.dtype != np.int8:
+        return q @ mat.T
+    # Dequantize block by block; the query stays float32 (asymmetric
+    # quantization), which keeps recall close to the float index.
+    n = mat.shape[0]
+    out = np.empty((q.shape[0], n), dtype=np.float32)
+    q_t = (q / INT8_SCALE).T
+    for start in range(0, n, _SCORE_BLOCK):
+        block = mat[start:start + _SCORE_BLOCK].astype(np.float32)
+        out[:, start:start + block.shape[0]] = (block @ q_t).T
+    return out
+
+
+def remove_flat_index(chroma_dir: str, collection: str) -> None:
+    """Delete a saved index (e.g. before the collection is rewritten)."""
+    vec_path, ids_path = _index_paths(chroma_dir, collection)
+    _INDEX_CACHE.pop(vec_path, None)
+    for p in (vec_path, ids_path):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def save_flat_index(chroma_dir: str, collection: str, ids: Sequence[str], vectors: Any,
+                    quantize: str = "int8") -> bool:
+    """Persist `vectors` (rows aligned with `ids`) for exact search.
+
+    `quantize` is "int8" (default) or "none" to keep full float32 rows.
+
+    Returns False (and removes any stale index) when there is nothing to save
+    or the collection is too large to benefit.
+    """
+    import numpy as np
+
+    if quantize not in QUANTIZE_CHOICES:
+        raise ValueError(f"quantize must be one of {QUANTIZE_CHOICES}, got {quantize!r}")
+    vec_path, ids_path = _index_paths(chroma_dir, collection)
+    if not ids or len(ids) > MAX_FLAT_ROWS:
+        remove_flat_index(chroma_dir, collection)
+        return False
+    _INDEX_CACHE.pop(vec_path, None)
+    mat = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    if quantize == "int8":
+        mat = _quantize_rows(mat)
+    os.makedirs(chroma_dir, exist_ok=True)
+    # Write ids first: the loader keys its cache on the matrix file
+    with open(ids_path, "w", encoding="utf-8") as f:
+        json.dump(list(ids), f)
+    np.save(vec_path, mat)
+    return True
+
+
+def load_flat_index(chroma_dir: str, collection: str) -> Optional[Tuple[List[str], Any]]:
+    """Return (ids, matrix) for a collection, or None if no index was saved.
+
+    The matrix is memory-mapped, so opening it is O(1) and pages are shared
+    with the OS cache across processes. Loaded indexes are cached in-process
+    and reloaded when the file changes.
+    """
+    vec_path, ids_path = _index_paths(chroma_dir, collection)
+    try:
+        mtime = os.path.getmtime(vec_path)
+    except OSError:
+        return None
+    cached = _INDEX_CACHE.get(vec_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        import numpy as np
+
+        mat = np.load(vec_path, mmap_mode="r")
+        with open(ids_path, "r", encoding="utf-8") as f:
+            ids = json.load(f)
+    except Exception:
+        return None
+    if len(ids) != mat.shape[0]:
+        return None
+    _INDEX_CACHE[vec_path] = (mtime, (ids, mat))
+    return ids, mat
+
+
+def search_flat_rows(index: Tuple[List[str], Any], query_vectors: Sequence[Sequence[float]], k: int) -> List[List[Tuple[int, float]]]:
+    """Like `search_flat_index` but return (row, distance) pairs, nearest first."""
+    import numpy as np
+
+    _, mat = index
+    n = mat.shape[0]
+    if n == 0 or k <= 0:
+        return [[] for _ in query_vectors]
+    k = min(k, n)
+    q = _normalize_rows(np.asarray(query_vectors, dtype=np.float32))
+    scores = _cosine_scores(mat, q)
+    # argpartition finds the k best in O(n); only those k get sorted
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    out: List[List[Tuple[int, float]]] = []
+    for row, cand in zip(scores, top):
+        order = cand[np.argsort(-row[cand])]
+        # int8 rounding can push cosine a hair past 1; clamp to a valid distance
+        out.append([(int(i), max(0.0, float(2.0 - 2.0 * row[i]))) for i in order])
+    return out
+
+
+def search_flat_index(index: Tuple[List[str], Any], query_vectors: Sequence[Sequence[float]], k: int) -> List[List[Tuple[str, float]]]:
+    """Return the top-`k` (id, distance) pairs per query, nearest first.
+
+    Distances are squared L2 between unit vectors (2 - 2*cosine), the same
+    scale Chroma reports for its default "l2" space.
+    """
+    ids = index[0]
+    return [[(ids[i], dist) for i, dist in row] for row in search_flat_rows(index, query_vectors, k)]
+
+
+def row_vectors(index: Tuple[List[str], Any], rows: Sequence[int]) -> Any:
+    """Return the given rows as float32 unit vectors (dequantized if int8)."""
+    import numpy as np
+
+    mat = index[1]
+    picked = np.asarray(mat[list(rows)], dtype=np.float32)
+    return picked / INT8_SCALE if mat.dtype == np.int8 else picked
@@ -6,8 +6,10 @@ Responsibilities:
 - Parse a GitHub repository URL into (owner, repo)
 - Query GitHub for repository metadata and a recursive git tree
 - Filter the tree to text/code files we want to ingest
-- Download file contents via the fast raw URL (public) or the API (private/fallback)
+- Download file contents via the fast raw URL (public) or the API (private/fallback),
+    or the whole branch at once as a tarball
 - Extract useful text from notebooks (.ipynb)
+- Remember the blob sha of each saved file so re-ingesting skips unchanged files
 
 Design notes:
 - Keep helpers synchronous and dependency-light so behavior is explicit.
@@ -17,18 +19,73 @@ Design notes:
 from __future__ import annotations
 
 import base64
+import hashlib
 import json
 import logging
 import os
-from typing import Dict, List, Optional, Tuple
+import re
+import tarfile
+import time
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterator, List, Optional, Pattern, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import utils
+
+try:
+    import ijson  # type: ignore[import-not-found]
+except ImportError:  # optional; notebooks are parsed with stdlib json otherwise
+    ijson = None
 
 log = logging.getLogger(__name__)
 
 # Common user-agent
 HEADERS = {"User-Agent": "repo-ingestor/1.0"}
 
+# Concurrent downloads used by the ingestion runners (and the size of the
+# connection pool backing them).
+DEFAULT_FETCH_WORKERS = 16
+
+
+def create_session(token: Optional[str] = None, pool_size: int = DEFAULT_FETCH_WORKERS) -> requests.Session:
+    """Return a keep-alive Session preloaded with HEADERS (and auth if `token`).
+
+    Reusing one session across downloads and API calls avoids a new TCP/TLS
+    handshake per request. `pool_size` should be at least the number of
+    threads sharing it. Dropped connections are retried with a short backoff;
+    HTTP error statuses are left to the caller.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    if token:
+        session.headers["Authorization"] = f"token {token}"
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Longest we will sleep waiting for an exhausted API rate limit to reset
+MAX_RATE_LIMIT_WAIT = 60.0
+
+
+def _rate_limit_wait(r: requests.Response) -> Optional[float]:
+    """Seconds to wait before retrying `r`, or None if it isn't a rate-limit response."""
+    if r.status_code not in (403, 429):
+        return None
+    retry_after = r.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_RATE_LIMIT_WAIT)
+    if r.headers.get("X-RateLimit-Remaining") == "0":
+        reset = r.headers.get("X-RateLimit-Reset", "")
+        wait = float(reset) - time.time() if reset.isdigit() else MAX_RATE_LIMIT_WAIT
+        return min(max(wait, 1.0), MAX_RATE_LIMIT_WAIT)
+    return None
+
 
 def parse_github_url(url: str) -> Tuple[str, str]:
     """Parse a GitHub repo URL and return (owner, repo).
@@ -71,24 +128,28 @@ def parse_github_url(url: str) -> Tuple[str, str]:
     return owner, repo
 
 
-def get_repo_info(owner: str, repo: str, token: Optional[str] = None) -> Dict:
+def get_repo_info(owner: str, repo: str, token: Optional[str] = None,
+                  session: Optional[requests.Session] = None) -> Dict:
     """Return repository metadata from GitHub API (public endpoint).
 
     Returns JSON with keys such as `default_branch`, `description`, `language`.
+    Pass a `session` from `create_session` to reuse its connection.
     """
     # Query the repository endpoint to learn the default branch and metadata.
     # Public repos do not require authentication but providing a token increases
     # rate limits and allows access to private repositories.
+    http = session or requests
     url = f"https://api.github.com/repos/{owner}/{repo}"
     headers = HEADERS.copy()
     if token:
         headers["Authorization"] = f"token {token}"
-    r = requests.get(url, headers=headers)
+    r = http.get(url, headers=headers)
     r.raise_for_status()
     return r.json()
 
 
-def get_repo_tree(owner: str, repo: str, branch: str, token: Optional[str] = None) -> List[Dict]:
+def get_repo_tree(owner: str, repo: str, branch: str, token: Optional[str] = None,
+                  session: Optional[requests.Session] = None) -> List[Dict]:
     """Fetch the recursive git tree for the given branch.
 
     Returns a list of tree entries with keys: path, mode, type, sha, size (optional), url
@@ -96,17 +157,31 @@ def get_repo_tree(owner: str, repo: str, branch: str, token: Optional[str] = Non
     # Use the git/trees API with recursive=1 to retrieve a flat list of all
     # files (blobs) and directories (trees) for the branch. This can return
     # a large payload for big repositories.
+    http = session or requests
     url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
     headers = HEADERS.copy()
     if token:
         headers["Authorization"] = f"token {token}"
-    r = requests.get(url, headers=headers)
+    r = http.get(url, headers=headers)
     r.raise_for_status()
     data = r.json()
     tree = data.get("tree", [])
     return tree
 
 
+def get_branch_head_sha(owner: str, repo: str, branch: str, token: Optional[str] = None,
+                        session: Optional[requests.Session] = None) -> str:
+    """Return the commit SHA at the tip of `branch`."""
+    http = session or requests
+    url = f"https://api.github.com/repos/{owner}/{repo}/commits/{branch}"
+    headers = HEADERS.copy()
+    if token:
+        headers["Authorization"] = f"token {token}"
+    r = http.get(url, headers=headers, timeout=15)
+    r.raise_for_status()
+    return r.json()["sha"]
+
+
 TEXT_EXTENSIONS = {
     ".py",
     ".js",
@@ -144,67 +219,134 @@ PATH_EXCLUDES = {
 
 
 def is_text_file(path: str, include_exts: Optional[set] = None) -> bool:
-    ext = os.path.splitext(path)[1].lower()
+    ext = utils.file_ext(path)
     if include_exts is None:
         return ext in TEXT_EXTENSIONS
     return ext in include_exts
 
 
-def filter_paths(tree: List[Dict], include_exts: Optional[set] = None, max_file_size: int = 1_000_000, path_excludes: Optional[set] = None) -> List[Dict]:
+@lru_cache(maxsize=32)
+def compile_excludes(excludes: FrozenSet[str]) -> Pattern[str]:
+    """Compile path-segment excludes into one regex matching any excluded segment.
+
+    Cached, so callers passing the same set share one compiled pattern.
+    """
+    alternation = "|".join(sorted(re.escape(seg) for seg in excludes if seg))
+    if not alternation:
+        return re.compile(r"(?!)")  # matches nothing
+    return re.compile(rf"(?:^|/)(?:{alternation})(?:/|$)")
+
+
+def filter_paths(tree: List[Dict], include_exts: Optional[set] = None, max_file_size: int = 1_000_000, path_excludes: Optional[set] = None,
+                 exclude_regex: Optional[Pattern[str]] = None) -> List[Dict]:
     """Filter tree entries to text files and reasonable size.
 
     Parameters
     - tree: output from get_repo_tree
     - include_exts: optional set of extensions to include (e.g., {'.py', '.md'})
     - max_file_size: skip files with size > this many bytes (if size available in tree entry)
+    - path_excludes: extra path segments to skip (added to PATH_EXCLUDES)
+    - exclude_regex: precompiled pattern (see `compile_excludes`) used instead of
+      the segment sets
     """
     # Build a filtered list of tree entries we intend to fetch.
     # Only include blobs (actual file contents). Exclude directories and other
     # git objects.
     filtered = []
-    # Normalize excludes
-    excludes = set(path_excludes) if path_excludes else set()
-    excludes = excludes.union(PATH_EXCLUDES)
+    if exclude_regex is None:
+        exclude_regex = compile_excludes(frozenset(path_excludes or ()) | frozenset(PATH_EXCLUDES))
 
     for entry in tree:
         if entry.get("type") != "blob":
             # not a file
             continue
-        path = entry.get("path", "")
-        # Skip common vendor/build paths by checking path segments
-        parts = [p for p in path.split("/") if p]
-        if any(seg in excludes for seg in parts):
-            log.debug("Excluding path by segment match: %s", path)
-            continue
-        # Extension-based filtering is fast and typically accurate enough
-        # to exclude binary assets like images or compiled artifacts.
-        if not is_text_file(path, include_exts):
-            continue
-        # If the git tree provided a size, use it to skip very large files.
-        size = entry.get("size")
-        if size is not None and size > max_file_size:
-            log.debug("Skipping large file %s (%s bytes)", path, size)
-            continue
-        filtered.append(entry)
+        if path_allowed(entry.get("path", ""), entry.get("size"), include_exts, max_file_size, exclude_regex):
+            filtered.append(entry)
     return filtered
 
 
-def fetch_file_text(owner: str, repo: str, branch: str, path: str, token: Optional[str] = None) -> Tuple[str, Dict]:
+def path_allowed(path: str, size: Optional[int], include_exts: Optional[set], max_file_size: int, exclude_regex: Pattern[str]) -> bool:
+    """Apply the `filter_paths` rules to a single file path (and size, if known)."""
+    # Skip common vendor/build paths: one regex search checks every segment
+    if exclude_regex.search(path):
+        log.debug("Excluding path by segment match: %s", path)
+        return False
+    # Extension-based filtering is fast and typically accurate enough
+    # to exclude binary assets like images or compiled artifacts.
+    if not is_text_file(path, include_exts):
+        return False
+    # If the git tree provided a size, use it to skip very large files.
+    if size is not None and size > max_file_size:
+        log.debug("Skipping large file %s (%s bytes)", path, size)
+        return False
+    return True
+
+
+def iter_tarball_files(owner: str, repo: str, branch: str, token: Optional[str] = None,
+                       include_exts: Optional[set] = None, max_file_size: int = 1_000_000,
+                       path_excludes: Optional[set] = None,
+                       session: Optional[requests.Session] = None) -> Iterator[Tuple[str, str, str]]:
+    """Download the branch as one tarball and yield (path, text, blob sha) for text files.
+
+    One streamed request replaces a request per file. The same rules as
+    `filter_paths` apply; contents are decoded as UTF-8 (invalid bytes are
+    replaced). Notebooks are yielded as raw JSON like `fetch_file_text` does.
+    The archive carries no shas, so each one is computed from the member's
+    bytes (see `git_blob_sha`) for the fetch manifest.
+    """
+    http = session or requests
+    url = f"https://api.github.com/repos/{owner}/{repo}/tarball/{branch}"
+    headers = HEADERS.copy()
+    if token:
+        headers["Authorization"] = f"token {token}"
+    exclude_regex = compile_excludes(frozenset(path_excludes or ()) | frozenset(PATH_EXCLUDES))
+    with http.get(url, headers=headers, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        # "r|gz" reads the archive as a forward-only stream, so nothing is
+        # buffered beyond the current member
+        with tarfile.open(fileobj=r.raw, mode="r|gz") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                # Members live under a single "<owner>-<repo>-<sha>/" folder
+                path = member.name.split("/", 1)[1] if "/" in member.name else ""
+                if not path or not path_allowed(path, member.size, include_exts, max_file_size, exclude_regex):
+                    continue
+                fobj = tar.extractfile(member)
+                if fobj is None:
+                    continue
+                data = fobj.read()
+                yield path, data.decode("utf-8", errors="replace"), git_blob_sha(data)
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Return the sha git assigns to a blob with these bytes (as listed in the tree)."""
+    h = hashlib.sha1(b"blob %d\0" % len(data))
+    h.update(data)
+    return h.hexdigest()
+
+
+def fetch_file_text(owner: str, repo: str, branch: str, path: str, token: Optional[str] = None,
+                    session: Optional[requests.Session] = None) -> Tuple[str, Dict]:
     """Fetch file contents as text.
 
     Strategy:
     1. Try raw.githubusercontent.com URL (fast, works for public files)
     2. If that fails (404 or 403), and token provided, use /repos/{owner}/{repo}/contents/{path} API
 
+    Pass a `session` from `create_session` to reuse pooled connections when
+    fetching many files (it is safe to share across threads for GETs).
+
     Returns (text, metadata)
     metadata contains: { 'fetched_via': 'raw'|'api', 'encoding'?: ... }
     """
+    http = session or requests
     # First attempt: fetch the raw file via raw.githubusercontent.com which
     # is fast and suitable for public repositories.
     raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/{path}"
     headers = HEADERS.copy()
     try:
-        r = requests.get(raw_url, headers=headers, timeout=15)
+        r = http.get(raw_url, headers=headers, timeout=15)
         if r.status_code == 200:
             # Use requests' detected encoding for best-effort decoding.
             r.encoding = r.apparent_encoding or "utf-8"
@@ -222,7 +364,13 @@ def fetch_file_text(owner: str, repo: str, branch: str, path: str, token: Option
     headers = HEADERS.copy()
     if token:
         headers["Authorization"] = f"token {token}"
-    r = requests.get(api_url, headers=headers, timeout=15)
+    r = http.get(api_url, headers=headers, timeout=15)
+    wait = _rate_limit_wait(r)
+    if wait is not None:
+        # Many concurrent fetches can exhaust the API quota; back off once
+        log.warning("GitHub rate limit hit; retrying %s in %.0fs", path, wait)
+        time.sleep(wait)
+        r = http.get(api_url, headers=headers, timeout=15)
     r.raise_for_status()
     data = r.json()
     if data.get("encoding") == "base64" and "content" in data:
@@ -245,21 +393,109 @@ def fetch_file_text(owner: str, repo: str, branch: str, path: str, token: Option
         raise RuntimeError(f"Unexpected content response for {path}")
 
 
+def manifest_path(out_dir: str) -> str:
+    """Return the fetch manifest path for `out_dir`.
+
+    It sits next to the directory, not inside it, so the chunker never reads it.
+    """
+    return os.path.normpath(out_dir) + ".manifest.json"
+
+
+def load_fetch_manifest(out_dir: str) -> Dict[str, str]:
+    """Return {repo path: git blob sha} for the files saved by the previous run."""
+    try:
+        with open(manifest_path(out_dir), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_fetch_manifest(out_dir: str, manifest: Dict[str, str]) -> None:
+    with open(manifest_path(out_dir), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def read_cached_file(out_path: str, path: str, sha: Optional[str], manifest: Dict[str, str]) -> Optional[str]:
+    """Return the saved text for `path` if its blob sha is unchanged since it was saved.
+
+    Git blob shas identify content exactly, so a match means the file can be
+    reused without any request (not even a conditional one).
+    """
+    if not sha or manifest.get(path) != sha:
+        return None
+    try:
+        with open(out_path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+class _Utf8Reader:
+    """Read-only file object returning a string's UTF-8 bytes a slice at a time.
+
+    Lets ijson consume a notebook already held as `str` without first
+    encoding a full bytes copy of it.
+    """
+
+    def __init__(self, text: str) -> None:
+        self._text = text
+        self._pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._pos
+        end = len(self._text) if size is None or size < 0 else start + size
+        self._pos = min(end, len(self._text))
+        return self._text[start:end].encode("utf-8")
+
+
+def _notebook_cells(nb_content: str) -> Iterator[Tuple[Optional[str], object]]:
+    """Yield (cell_type, source) per notebook cell.
+
+    With `ijson` only the `cell_type` and `source` fields are kept; outputs
+    (often large base64 images) are still parsed, but each value is dropped
+    as soon as it is seen instead of being collected into a notebook dict.
+    Raises ValueError on malformed JSON.
+    """
+    if ijson is None:
+        nb = json.loads(nb_content)
+        for cell in nb.get("cells", []):
+            yield cell.get("cell_type"), cell.get("source", [])
+        return
+    cell_type: Optional[str] = None
+    src: object = []
+    try:
+        for prefix, event, value in ijson.parse(_Utf8Reader(nb_content)):
+            if prefix == "cells.item.source.item":
+                src.append(value)  # type: ignore[attr-defined]
+            elif prefix == "cells.item.cell_type":
+                cell_type = value
+            elif prefix == "cells.item.source":
+                if event == "start_array":
+                    src = []
+                elif event != "end_array":
+                    src = value
+            elif prefix == "cells.item":
+                if event == "end_map":
+                    yield cell_type, src
+                elif event == "start_map":
+                    cell_type, src = None, []
+    except ijson.JSONError as e:
+        raise ValueError(str(e)) from e
+
+
 def extract_notebook_text(nb_content: str) -> str:
     """Extract text from a notebook JSON string by joining code and markdown cell sources."""
+    parts = []
     try:
-        nb = json.loads(nb_content)
+        for cell_type, src in _notebook_cells(nb_content):
+            if isinstance(src, list):
+                src_text = "".join(src)
+            else:
+                src_text = str(src)
+            # Add a tiny header per cell so downstream processors can tell apart
+            # markdown vs code. This helps when chunking or building context.
+            parts.append(f"# {cell_type} cell\n" + src_text)
     except Exception:
         return ""
-    parts = []
-    for cell in nb.get("cells", []):
-        cell_type = cell.get("cell_type")
-        src = cell.get("source", [])
-        if isinstance(src, list):
-            src_text = "".join(src)
-        else:
-            src_text = str(src)
-        # Add a tiny header per cell so downstream processors can tell apart
-        # markdown vs code. This helps when chunking or building context.
-        parts.append(f"# {cell_type} cell\n" + src_text)
     return "\n\n".join(parts)
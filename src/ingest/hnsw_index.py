@@ -0,0 +1,147 @@
+"""Approximate vector search with hnswlib for collections too large for exact search.
+
+Above flat_index.MAX_FLAT_ROWS a brute-force scan stops paying off. When the
+optional `hnswlib` package is installed, Step 3 builds an HNSW graph from
+the same streamed batches (one bulk build, no per-insert overhead) and the
+retriever (Step 4) searches it instead of Chroma's index whenever it still
+matches the collection. Chroma remains the store for documents/metadata.
+
+Files written per collection under the Chroma directory:
+- `<collection>.hnsw.bin`        the hnswlib index (inner product on unit vectors)
+- `<collection>.hnsw_ids.json`   {"dim": ..., "ids": [...]}: the vector size and
+                                 the Chroma id of each label, in label order
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Graph degree / build-time beam width: hnswlib's recommended defaults for
+# sentence-embedding sized vectors
+HNSW_M = 16
+EF_CONSTRUCTION = 200
+# Query-time beam width; raised to k when k is larger
+EF_SEARCH = 64
+
+# Collection metadata giving Chroma's own HNSW index the same parameters
+# (Chroma's default search_ef of 10 costs recall at top-k). Only applied when a
+# collection is created; the "l2" space keeps distances on the 2 - 2*cosine
+# scale the flat and hnswlib indexes report.
+CHROMA_HNSW_METADATA: Dict[str, Any] = {
+    "hnsw:space": "l2",
+    "hnsw:M": HNSW_M,
+    "hnsw:construction_ef": EF_CONSTRUCTION,
+    "hnsw:search_ef": EF_SEARCH,
+}
+
+# index path -> (mtime, (ids, index))
+_INDEX_CACHE: Dict[str, Tuple[float, Tuple[List[str], Any]]] = {}
+
+
+def _index_paths(chroma_dir: str, collection: str) -> Tuple[str, str]:
+    base = os.path.join(chroma_dir, collection)
+    return base + ".hnsw.bin", base + ".hnsw_ids.json"
+
+
+def available() -> bool:
+    """Return True if the optional `hnswlib` package can be imported."""
+    try:
+        import hnswlib  # type: ignore[import-not-found]  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HnswBuilder:
+    """Accumulate vectors batch by batch into an in-memory HNSW index."""
+
+    def __init__(self, dim: int, capacity: int = 100_000) -> None:
+        import hnswlib  # type: ignore[import-not-found]
+
+        self.dim = dim
+        self.ids: List[str] = []
+        self.index = hnswlib.Index(space="ip", dim=dim)
+        self.index.init_index(max_elements=capacity, ef_construction=EF_CONSTRUCTION, M=HNSW_M)
+
+    def add(self, ids: Sequence[str], vectors: Any) -> None:
+        import numpy as np
+
+        vecs = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        start = len(self.ids)
+        needed = start + len(ids)
+        if needed > self.index.get_max_elements():
+            # Grow geometrically so resizes stay rare
+            self.index.resize_index(max(needed, 2 * self.index.get_max_elements()))
+        self.index.add_items(vecs / norms, np.arange(start, needed))
+        self.ids.extend(ids)
+
+    def save(self, chroma_dir: str, collection: str) -> None:
+        index_path, ids_path = _index_paths(chroma_dir, collection)
+        _INDEX_CACHE.pop(index_path, None)
+        os.makedirs(chroma_dir, exist_ok=True)
+        # Write ids first: the loader keys its cache on the index file
+        with open(ids_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "ids": self.ids}, f)
+        self.index.save_index(index_path)
+
+
+def remove_hnsw_index(chroma_dir: str, collection: str) -> None:
+    """Delete a saved index (e.g. when the collection is now small enough for exact search)."""
+    index_path, ids_path = _index_paths(chroma_dir, collection)
+    _INDEX_CACHE.pop(index_path, None)
+    for p in (index_path, ids_path):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def load_hnsw_index(chroma_dir: str, collection: str) -> Optional[Tuple[List[str], Any]]:
+    """Return (ids, index) for a collection, or None if none was saved or hnswlib is missing."""
+    index_path, ids_path = _index_paths(chroma_dir, collection)
+    try:
+        mtime = os.path.getmtime(index_path)
+    except OSError:
+        return None
+    cached = _INDEX_CACHE.get(index_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        import hnswlib  # type: ignore[import-not-found]
+
+        with open(ids_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        ids = meta["ids"]
+        index = hnswlib.Index(space="ip", dim=int(meta["dim"]))
+        index.load_index(index_path)
+    except Exception:
+        return None
+    if index.get_current_count() != len(ids):
+        return None
+    _INDEX_CACHE[index_path] = (mtime, (ids, index))
+    return ids, index
+
+
+def search_hnsw_index(loaded: Tuple[List[str], Any], query_vectors: Sequence[Sequence[float]], k: int) -> List[List[Tuple[str, float]]]:
+    """Return the top-`k` (id, distance) pairs per query, nearest first.
+
+    Distances use the same squared-L2-between-unit-vectors scale as Chroma
+    and flat_index (2 - 2*cosine).
+    """
+    import numpy as np
+
+    ids, index = loaded
+    k = min(k, len(ids))
+    if k <= 0:
+        return [[] for _ in query_vectors]
+    q = np.asarray(query_vectors, dtype=np.float32)
+    norms = np.linalg.norm(q, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    index.set_ef(max(EF_SEARCH, k))
+    labels, dists = index.knn_query(q / norms, k=k)
+    # hnswlib's "ip" distance is 1 - dot, so squared L2 is twice that
+    return [
+        [(ids[int(label)], max(0.0, 2.0 * float(d))) for label, d in zip(row_labels, row_dists)]
+        for row_labels, row_dists in zip(labels, dists)
+    ]
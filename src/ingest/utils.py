@@ -5,11 +5,25 @@ Small convenience helpers used by the ingestion CLI and modules:
 - `safe_write_text` writes text files safely (creates parents, handles encoding)
 - `repo_path_to_out_path` maps a repo-relative path to the output folder while
     preserving directory structure
+- `dumps_jsonl` / `loads_json` (de)serialize JSONL records, using `orjson`
+    when installed and the stdlib `json` module otherwise
+- `chunk_id` derives the fixed-length Chroma id of a chunk
+- `file_ext` returns a path's lowercased extension
+- `looks_binary` flags content that is not worth chunking (binary data that
+    slipped through the extension filter)
 """
 from __future__ import annotations
 
+import hashlib
+import json
 import os
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Optional, Union
+
+try:
+    import orjson  # type: ignore[import-not-found]
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
 
 
 DEFAULT_TEXT_EXTENSIONS = {
@@ -33,6 +47,67 @@ DEFAULT_TEXT_EXTENSIONS = {
 }
 
 
+def chunk_id(repo: str, file_path: str, chunk_index: Any) -> str:
+    """Return the deterministic Chroma id for a chunk: 16 hex chars (64-bit BLAKE2b).
+
+    Fixed-length ids keep Chroma's id index small and fast to search. The
+    stdlib hash is used (not an optional one) so ids never depend on which
+    packages are installed.
+    """
+    # Hashing is incremental: the digest of "repo|path|index" equals the
+    # repo prefix's cached state extended with "path|index"
+    h = _repo_hash_state(repo).copy()
+    h.update(f"{file_path}|{chunk_index}".encode("utf-8"))
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=32)
+def _repo_hash_state(repo: str) -> Any:
+    """Return a BLAKE2b state that has already absorbed "<repo>|" (shared; copy before updating)."""
+    return hashlib.blake2b(f"{repo}|".encode("utf-8"), digest_size=8)
+
+
+# Characters sampled, and the share of control characters (other than tab,
+# newline, form feed, carriage return) above which content counts as binary
+BINARY_SNIFF_CHARS = 4096
+BINARY_CONTROL_RATIO = 0.3
+# str.translate table deleting exactly those control characters
+_CONTROL_CHARS = dict.fromkeys(c for c in range(32) if c not in (9, 10, 12, 13))
+
+
+def file_ext(path: str) -> str:
+    """Return the lowercased extension of `path` ("" if none).
+
+    Same result as `os.path.splitext(path)[1].lower()` (leading dots of the
+    file name do not start an extension) without the os.path call overhead.
+    """
+    dot = path.rfind(".")
+    if dot < 0:
+        return ""
+    start = path.rfind(os.sep)
+    if os.altsep:
+        start = max(start, path.rfind(os.altsep))
+    start += 1
+    if dot <= start or not path[start:dot].strip("."):
+        return ""
+    return path[dot:].lower()
+
+
+def looks_binary(text: str) -> bool:
+    """Return True if `text` looks like decoded binary data rather than text.
+
+    Checks the first BINARY_SNIFF_CHARS characters for a NUL or a high share
+    of control characters.
+    """
+    sample = text[:BINARY_SNIFF_CHARS]
+    if not sample:
+        return False
+    if "\x00" in sample:
+        return True
+    controls = len(sample) - len(sample.translate(_CONTROL_CHARS))
+    return controls / len(sample) > BINARY_CONTROL_RATIO
+
+
 def ensure_dir(path: str) -> None:
     """Create directory if not exists (like mkdir -p).
 
@@ -48,11 +123,20 @@ def safe_write_text(out_path: str, text: str, encoding: Optional[str] = "utf-8")
     - Ensures parent directories exist before writing.
     - Uses `errors='replace'` to avoid crashes on unexpected encodings; this
       preserves as much text as possible while avoiding exceptions.
+
+    The parent is only created when the open fails, so writing many files into
+    existing directories costs a single open per file. No fsync is issued:
+    the raw files are a re-creatable cache.
     """
-    parent = os.path.dirname(out_path)
-    if parent:
+    try:
+        f = open(out_path, "w", encoding=encoding, errors="replace")
+    except FileNotFoundError:
+        parent = os.path.dirname(out_path)
+        if not parent:
+            raise
         ensure_dir(parent)
-    with open(out_path, "w", encoding=encoding, errors="replace") as f:
+        f = open(out_path, "w", encoding=encoding, errors="replace")
+    with f:
         f.write(text)
 
 
@@ -65,3 +149,17 @@ def repo_path_to_out_path(out_dir: str, file_path: str) -> str:
     # the output directory so the saved files preserve the repo layout.
     safe_path = file_path.replace("\\", "/")
     return os.path.join(out_dir, safe_path)
+
+
+def dumps_jsonl(obj: Any) -> bytes:
+    """Serialize `obj` as one UTF-8 encoded JSONL line (including the newline)."""
+    if orjson is not None:
+        return orjson.dumps(obj) + b"\n"
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def loads_json(data: Union[bytes, str]) -> Any:
+    """Parse one JSON document from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
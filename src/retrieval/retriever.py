@@ -6,17 +6,153 @@ and returns ranked results plus a helper to build a context block.
 """
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from ingest.embeddings import embed_texts_sbert
+from ingest import embed_service, flat_index, hnsw_index
+from ingest.embeddings import embed_backend, embed_texts_sbert
+
+# Query vectors kept per (model, backend, text); interactive sessions often
+# repeat or re-ask questions, and a hit skips the forward pass entirely
+QUERY_CACHE_SIZE = 1024
+_QUERY_CACHE: "OrderedDict[Tuple[str, str, str], Tuple[float, ...]]" = OrderedDict()
+_QUERY_CACHE_LOCK = threading.Lock()
 
 
 def embed_query(query: str, model: str = "sentence-transformers/all-MiniLM-L6-v2") -> List[float]:
     """Embed a single query string into a vector using the local model."""
-    if not query or not query.strip():
+    return embed_queries([query], model=model)[0]
+
+
+def embed_queries(queries: List[str], model: str = "sentence-transformers/all-MiniLM-L6-v2") -> List[List[float]]:
+    """Embed several query strings in one forward pass.
+
+    Uses a running embed server (scripts/embed_server.py) when available so
+    short-lived CLI processes skip loading the model. Recently embedded
+    queries are served from an in-process LRU cache.
+    """
+    if not queries or any(not q or not q.strip() for q in queries):
         raise ValueError("Query is empty")
-    vecs = embed_texts_sbert([query.strip()], model=model)
-    return vecs[0]
+    texts = [q.strip() for q in queries]
+    backend = embed_backend()
+    keys = [(model, backend, t) for t in texts]
+    found: Dict[Tuple[str, str, str], Tuple[float, ...]] = {}
+    with _QUERY_CACHE_LOCK:
+        for key in keys:
+            if key in _QUERY_CACHE:
+                _QUERY_CACHE.move_to_end(key)
+                found[key] = _QUERY_CACHE[key]
+    missing = list(dict.fromkeys(t for key, t in zip(keys, texts) if key not in found))
+    if missing:
+        vecs = embed_service.embed_remote(missing, model)
+        if vecs is None:
+            vecs = embed_texts_sbert(missing, model=model)
+        with _QUERY_CACHE_LOCK:
+            for text, vec in zip(missing, vecs):
+                key = (model, backend, text)
+                found[key] = _QUERY_CACHE[key] = tuple(vec)
+            while len(_QUERY_CACHE) > QUERY_CACHE_SIZE:
+                _QUERY_CACHE.popitem(last=False)
+    return [list(found[key]) for key in keys]
+
+
+# Chroma clients and collection handles reused across queries: opening the
+# SQLite store and loading the HNSW segment is the slow part of a first query.
+_CLIENT_CACHE: Dict[str, Any] = {}
+_COLLECTION_CACHE: Dict[Tuple[str, str], Any] = {}
+# Streamlit serves sessions from several threads; open each store only once
+_CACHE_LOCK = threading.RLock()
+
+
+def get_chroma_client(chroma_dir: str) -> Any:
+    """Return a cached PersistentClient for `chroma_dir`."""
+    # Import chromadb lazily to avoid hard failure if not installed in analysis tools
+    try:
+        import chromadb  # type: ignore[import-not-found]
+    except Exception as e:
+        raise RuntimeError("The `chromadb` package is required. Install with `pip install chromadb`.") from e
+
+    key = os.path.abspath(chroma_dir)
+    with _CACHE_LOCK:
+        if key not in _CLIENT_CACHE:
+            _CLIENT_CACHE[key] = chromadb.PersistentClient(path=chroma_dir)
+        return _CLIENT_CACHE[key]
+
+
+def get_collection(chroma_dir: str, collection_name: str) -> Any:
+    """Return a cached handle to an existing collection (raises if missing)."""
+    key = (os.path.abspath(chroma_dir), collection_name)
+    with _CACHE_LOCK:
+        if key not in _COLLECTION_CACHE:
+            _COLLECTION_CACHE[key] = get_chroma_client(chroma_dir).get_collection(name=collection_name)
+        return _COLLECTION_CACHE[key]
+
+
+def forget_collection(chroma_dir: str, collection_name: str) -> None:
+    """Drop a cached collection handle, e.g. after it was deleted or rebuilt."""
+    _COLLECTION_CACHE.pop((os.path.abspath(chroma_dir), collection_name), None)
+
+
+# With MMR, candidates fetched per requested result before reranking
+MMR_FETCH_FACTOR = 3
+
+
+def mmr_select(query_vec: Sequence[float], cand_vecs: Any, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """Pick `k` candidate indices by Maximal Marginal Relevance.
+
+    Balances similarity to the query (weight `lambda_mult`) against similarity
+    to the candidates already picked, so near-duplicate chunks (e.g. the
+    same code in several files) do not crowd out other sources. All pairwise
+    similarities come from one matrix product; each step only updates a
+    running max.
+    """
+    import numpy as np
+
+    cands = np.asarray(cand_vecs, dtype=np.float32)
+    n = cands.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return []
+    cands = cands / np.maximum(np.linalg.norm(cands, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(query_vec, dtype=np.float32)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+    sim_q = cands @ q
+    sim_cc = cands @ cands.T
+
+    first = int(np.argmax(sim_q))
+    selected = [first]
+    taken = np.zeros(n, dtype=bool)
+    taken[first] = True
+    # Highest similarity of each candidate to anything selected so far
+    max_sim = sim_cc[first].copy()
+    while len(selected) < k:
+        scores = lambda_mult * sim_q - (1.0 - lambda_mult) * max_sim
+        scores[taken] = -np.inf
+        nxt = int(np.argmax(scores))
+        selected.append(nxt)
+        taken[nxt] = True
+        np.maximum(max_sim, sim_cc[nxt], out=max_sim)
+    return selected
+
+
+def _attach_documents(coll: Any, hits: List[List[Tuple[str, float]]]) -> List[List[Dict[str, Any]]]:
+    """Turn per-query (id, distance) lists into result dicts with one `coll.get`."""
+    wanted = list({_id for row in hits for _id, _ in row})
+    got = coll.get(ids=wanted, include=["documents", "metadatas"]) if wanted else {"ids": []}
+    by_id = {
+        _id: (_doc, _meta)
+        for _id, _doc, _meta in zip(got.get("ids") or [], got.get("documents") or [], got.get("metadatas") or [])
+    }
+    return [
+        [
+            {"id": _id, "document": by_id[_id][0], "metadata": by_id[_id][1], "distance": _dist}
+            for _id, _dist in row
+            if _id in by_id
+        ]
+        for row in hits
+    ]
 
 
 def query_collection(
@@ -27,43 +163,107 @@ def query_collection(
     model: str = "sentence-transformers/all-MiniLM-L6-v2",
     k: int = 5,
     where: Optional[Dict[str, Any]] = None,
+    mmr_lambda: Optional[float] = None,
 ) -> List[Dict[str, Any]]:
     """Query a Chroma collection by semantic similarity.
 
-    Returns a list of {id, document, metadata, distance} sorted by similarity.
+    Returns a list of {id, document, metadata, distance} sorted by similarity
+    (or in MMR order when `mmr_lambda` is given).
     """
-    # Import chromadb lazily to avoid hard failure if not installed in analysis tools
+    return query_collection_many(chroma_dir, collection_name, [query], model=model, k=k, where=where, mmr_lambda=mmr_lambda)[0]
+
+
+def query_collection_many(
+    chroma_dir: str,
+    collection_name: str,
+    queries: List[str],
+    *,
+    model: str = "sentence-transformers/all-MiniLM-L6-v2",
+    k: int = 5,
+    where: Optional[Dict[str, Any]] = None,
+    mmr_lambda: Optional[float] = None,
+) -> List[List[Dict[str, Any]]]:
+    """Query a Chroma collection for several queries at once.
+
+    All queries are embedded together and searched with a single
+    `collection.query` call. Returns one result list per query, in order.
+
+    If `mmr_lambda` (0..1) is given, MMR_FETCH_FACTOR * k candidates are
+    retrieved and the `k` results are chosen by `mmr_select` for diversity.
+    """
+    fetch_k = k * MMR_FETCH_FACTOR if mmr_lambda is not None else k
+    qvecs = embed_queries(queries, model=model)
     try:
-        import chromadb  # type: ignore[import-not-found]
-    except Exception as e:
-        raise RuntimeError("The `chromadb` package is required. Install with `pip install chromadb`.") from e
+        coll = get_collection(chroma_dir, collection_name)
+        count = coll.count()
+    except Exception:
+        # The cached handle may point at a collection that was since
+        # recreated; reopen it once before giving up.
+        forget_collection(chroma_dir, collection_name)
+        coll = get_collection(chroma_dir, collection_name)
+        count = coll.count()
 
-    # Create or open the persistent client
-    client = chromadb.PersistentClient(path=chroma_dir)
-    coll = client.get_collection(name=collection_name)
+    # Small collections: exact search over the matrix saved at ingestion time.
+    # Only used when it still matches the collection and no filter is given.
+    index = None if where else flat_index.load_flat_index(chroma_dir, collection_name)
+    if index is not None and len(index[0]) == count and index[1].shape[1] == len(qvecs[0]):
+        hit_rows = flat_index.search_flat_rows(index, qvecs, fetch_k)
+        if mmr_lambda is not None:
+            hit_rows = [
+                [row[i] for i in mmr_select(qvec, flat_index.row_vectors(index, [r for r, _ in row]), k, mmr_lambda)]
+                for qvec, row in zip(qvecs, hit_rows)
+            ]
+        hits = [[(index[0][r], _dist) for r, _dist in row] for row in hit_rows]
+        return _attach_documents(coll, hits)
 
-    qvec = embed_query(query, model=model)
+    # Large collections: the hnswlib graph built at ingestion, if any (MMR
+    # needs candidate vectors, so it goes through Chroma instead)
+    graph = None if where or mmr_lambda is not None else hnsw_index.load_hnsw_index(chroma_dir, collection_name)
+    if graph is not None and len(graph[0]) == count and graph[1].dim == len(qvecs[0]):
+        return _attach_documents(coll, hnsw_index.search_hnsw_index(graph, qvecs, k))
 
     # Use explicit query_embeddings because we provide our own vectors
+    include = ["documents", "metadatas", "distances"]
+    if mmr_lambda is not None:
+        include.append("embeddings")
     if where:
-        resp = coll.query(query_embeddings=[qvec], n_results=k, where=where)
+        resp = coll.query(query_embeddings=qvecs, n_results=fetch_k, where=where, include=include)
     else:
-        resp = coll.query(query_embeddings=[qvec], n_results=k)
+        resp = coll.query(query_embeddings=qvecs, n_results=fetch_k, include=include)
+
+    all_results: List[List[Dict[str, Any]]] = []
+    for qi in range(len(qvecs)):
+        ids = resp["ids"][qi] if resp.get("ids") else []
+        docs = resp["documents"][qi] if resp.get("documents") else []
+        metas = resp["metadatas"][qi] if resp.get("metadatas") else []
+        dists = resp["distances"][qi] if resp.get("distances") else [None] * len(ids)
+
+        results: List[Dict[str, Any]] = []
+        for _id, _doc, _meta, _dist in zip(ids, docs, metas, dists):
+            results.append({
+                "id": _id,
+                "document": _doc,
+                "metadata": _meta,
+                "distance": _dist,
+            })
+        if mmr_lambda is not None and results:
+            embs = resp["embeddings"][qi]
+            results = [results[i] for i in mmr_select(qvecs[qi], embs, k, mmr_lambda)]
+        all_results.append(results)
+    return all_results
+
+
+def clip_documents(results: List[Dict[str, Any]], max_chars: int) -> List[Dict[str, Any]]:
+    """Return copies of `results` with each document cut to `max_chars`.
+
+    Used for source previews kept around after the full text has gone into
+    the prompt, so long-lived state does not hold whole chunks.
+    """
+    return [{**r, "document": (r.get("document") or "")[:max_chars]} for r in results]
 
-    ids = resp.get("ids", [[]])[0] if resp.get("ids") else []
-    docs = resp.get("documents", [[]])[0] if resp.get("documents") else []
-    metas = resp.get("metadatas", [[]])[0] if resp.get("metadatas") else []
-    dists = resp.get("distances", [[]])[0] if resp.get("distances") else [None] * len(ids)
 
-    results: List[Dict[str, Any]] = []
-    for _id, _doc, _meta, _dist in zip(ids, docs, metas, dists):
-        results.append({
-            "id": _id,
-            "document": _doc,
-            "metadata": _meta,
-            "distance": _dist,
-        })
-    return results
+# Between blocks in build_context
+CONTEXT_SEPARATOR = "\n\n---\n\n"
 
 
 def build_context(results: List[Dict[str, Any]], max_chars: int = 8000) -> str:
@@ -71,6 +271,7 @@ def build_context(results: List[Dict[str, Any]], max_chars: int = 8000) -> str:
 
     Truncates to approximately `max_chars` total characters.
     """
+    # Pieces are collected flat and joined once; no per-block strings
     parts: List[str] = []
     total = 0
     for i, r in enumerate(results, start=1):
@@ -79,10 +280,20 @@ def build_context(results: List[Dict[str, Any]], max_chars: int = 8000) -> str:
         repo = meta.get("repo", "")
         chunk_index = meta.get("chunk_index", None)
         header = f"[CTX #{i}] {repo} :: {file_path} :: chunk {chunk_index}"
-        body = r.get("document", "")
-        block = f"{header}\n{body}".strip()
-        if total + len(block) + 2 > max_chars:
+        body = r.get("document") or ""
+        # Chunks are stored stripped, so trimming is rarely needed
+        if body[-1:].isspace():
+            body = body.rstrip()
+        if not body:
+            header = header.rstrip()
+        block_len = len(header) + 1 + len(body) if body else len(header)
+        if total + block_len + 2 > max_chars:
             break
-        parts.append(block)
-        total += len(block) + 2
-    return "\n\n---\n\n".join(parts)
+        if parts:
+            parts.append(CONTEXT_SEPARATOR)
+        parts.append(header)
+        if body:
+            parts.append("\n")
+            parts.append(body)
+        total += block_len + 2
+    return "".join(parts)
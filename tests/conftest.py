@@ -0,0 +1,8 @@
+"""Make the project modules importable the same way the scripts do (`ingest.*`, `retrieval.*`)."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,140 @@
+"""Tests for the chunking helpers in ingest.chunker.
+
+The fast paths are checked against the straightforward implementations they
+replaced, on fixed edge cases plus seeded random inputs.
+"""
+import random
+import re
+
+import pytest
+
+from ingest import chunker
+
+MARKDOWN_HEADER_RE = re.compile(r"(?m)^#{1,6}\s+")
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "#",
+    "# ",
+    "#\n",
+    "##\n\n   x",
+    "####### x\n# a",
+    "# a\n## b\n###\n#### c",
+    "x\n#a\n# b",
+    "#\n#\n#",
+    "\n\n# a\n\n\n  # b\n# c\n#\x1cd",
+    "##\n   ## B\n# c",
+    "# Title\n\nIntro\n\n## Usage\n\nRun it.\n",
+])
+def test_split_markdown_sections_matches_regex(text):
+    assert chunker.split_markdown_sections(text) == MARKDOWN_HEADER_RE.split(text)
+
+
+def test_split_markdown_sections_matches_regex_fuzz():
+    rng = random.Random(0)
+    alphabet = "# \n\tx\x1c"
+    for _ in range(20000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        assert chunker.split_markdown_sections(text) == MARKDOWN_HEADER_RE.split(text), repr(text)
+
+
+def _normalize_text_reference(text):
+    # The original per-line implementation
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    out_lines = []
+    blank_run = 0
+    for line in (line.rstrip() for line in text.split("\n")):
+        blank_run = blank_run + 1 if line.strip() == "" else 0
+        if blank_run > 2:
+            continue
+        out_lines.append(line)
+    return "\n".join(out_lines).strip()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", ""),
+    (None, ""),
+    ("a\r\nb\rc", "a\nb\nc"),
+    ("def f():   \n    return 1\t\n", "def f():\n    return 1"),
+    ("a\n\n\n\n\n\nb", "a\n\n\nb"),
+    ("a\n\n\nb", "a\n\n\nb"),
+    ("a\n  \n\t\n \n\nb", "a\n\n\nb"),
+    ("\n\n  x  \n\n", "x"),
+])
+def test_normalize_text(text, expected):
+    assert chunker.normalize_text(text) == expected
+
+
+def test_normalize_text_matches_reference_fuzz():
+    rng = random.Random(0)
+    # Includes whitespace that str.rstrip strips but "\n" splitting ignores
+    alphabet = [" ", "\t", "\n", "\r", "x", "\x0b", "\x0c", "\x1c", "\x85", "\xa0", "y"]
+    for _ in range(50000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 25)))
+        assert chunker.normalize_text(text) == _normalize_text_reference(text), repr(text)
+
+
+def _chunk_by_char_reference(text, chunk_size_tokens=1000, overlap_tokens=200):
+    # The original while-loop implementation
+    if not text:
+        return []
+    chunk_size = chunk_size_tokens * chunker.TOKEN_TO_CHAR
+    overlap = overlap_tokens * chunker.TOKEN_TO_CHAR
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        chunks.append(text[start:end])
+        if end >= len(text):
+            break
+        start = max(0, end - overlap)
+    return [c.strip() for c in chunks if c.strip()]
+
+
+def test_chunk_by_char_windows_overlap():
+    text = "".join(chr(ord("a") + i % 26) for i in range(100))
+    chunks = chunker.chunk_by_char(text, chunk_size_tokens=10, overlap_tokens=2)
+    assert chunks == [text[0:40], text[32:72], text[64:100]]
+
+
+def test_chunk_by_char_empty_and_blank():
+    assert chunker.chunk_by_char("") == []
+    assert chunker.chunk_by_char("   \n\n  ", 1, 0) == []
+
+
+@pytest.mark.parametrize("size, overlap", [(5, 5), (5, 8)])
+def test_chunk_by_char_rejects_overlap_not_below_size(size, overlap):
+    with pytest.raises(ValueError, match="overlap_tokens must be smaller"):
+        chunker.chunk_by_char("some text", size, overlap)
+
+
+def test_chunk_by_char_rejects_non_positive_size():
+    with pytest.raises(ValueError, match="chunk_size_tokens must be positive"):
+        chunker.chunk_by_char("some text", 0, 0)
+
+
+def test_chunk_by_char_matches_reference_fuzz():
+    rng = random.Random(0)
+    for _ in range(20000):
+        text = "".join(rng.choice("ab \n") for _ in range(rng.randint(0, 200)))
+        size = rng.randint(1, 10)
+        overlap = rng.randint(0, size - 1)
+        assert chunker.chunk_by_char(text, size, overlap) == _chunk_by_char_reference(text, size, overlap), \
+            (text, size, overlap)
+
+
+def test_chunk_file_keeps_small_text_files_whole():
+    content = "key: value\nother: 1\n"
+    chunks = chunker.chunk_file(content, "o/r", "config.yaml")
+    assert [c["content"] for c in chunks] == ["key: value\nother: 1"]
+    assert chunks[0]["metadata"]["file_type"] == "config"
+
+
+def test_chunk_file_splits_small_markdown_and_code():
+    markdown = "# Intro\nSome text.\n\n## Usage\nRun it.\n"
+    assert [c["content"] for c in chunker.chunk_file(markdown, "o/r", "README.md")] == [
+        "Intro\nSome text.", "Usage\nRun it.",
+    ]
+    code = "import os\n\ndef a():\n    return 1\n\nclass B:\n    pass\n"
+    assert len(chunker.chunk_file(code, "o/r", "mod.py")) > 1
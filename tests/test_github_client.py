@@ -0,0 +1,85 @@
+"""Tests for the offline helpers in ingest.github_client (no network access)."""
+import base64
+import json
+import random
+
+import pytest
+
+from ingest import github_client
+
+try:
+    import ijson  # type: ignore[import-not-found]
+except ImportError:
+    ijson = None
+
+
+def _notebook_text_reference(nb_content):
+    # Load the whole notebook with the stdlib parser
+    try:
+        nb = json.loads(nb_content)
+    except Exception:
+        return ""
+    parts = []
+    for cell in nb.get("cells", []):
+        src = cell.get("source", [])
+        parts.append(f"# {cell.get('cell_type')} cell\n" + ("".join(src) if isinstance(src, list) else str(src)))
+    return "\n\n".join(parts)
+
+
+def _random_notebooks(seed):
+    rng = random.Random(seed)
+    for _ in range(300):
+        cells = []
+        for _ in range(rng.randint(0, 6)):
+            cell = {}
+            if rng.random() < 0.9:
+                cell["cell_type"] = rng.choice(["code", "markdown"])
+            r = rng.random()
+            if r < 0.6:
+                cell["source"] = [rng.choice(["x = 1\n", "# héllo ✓\n", "", 'a"b\\n']) for _ in range(rng.randint(0, 4))]
+            elif r < 0.8:
+                cell["source"] = "plain ✓ src"
+            # Keys named like the ones we extract, nested where they must be ignored
+            cell["outputs"] = [{"data": {"image/png": base64.b64encode(rng.randbytes(50)).decode(),
+                                         "text/plain": ["out"]},
+                                "source": ["not me"]}]
+            cell["metadata"] = {"cells": [{"source": "nested"}]}
+            cells.append(cell)
+        yield json.dumps({"metadata": {"source": "meta"}, "cells": cells, "nbformat": 4})
+    yield from ["", "{bad", '{"cells": []}', '{"cells":[{"source":["a"]}]}trailing']
+
+
+@pytest.fixture(params=["stdlib", "ijson"])
+def notebook_parser(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(github_client, "ijson", None)
+    elif ijson is None:
+        pytest.skip("ijson is not installed")
+    return request.param
+
+
+def test_extract_notebook_text_matches_json_fuzz(notebook_parser):
+    for nb_content in _random_notebooks(0):
+        assert github_client.extract_notebook_text(nb_content) == _notebook_text_reference(nb_content), nb_content
+
+
+def test_utf8_reader_returns_the_encoded_text_in_slices():
+    text = "ascii ✓ ünïcode " * 1000
+    reader = github_client._Utf8Reader(text)
+    pieces = []
+    while True:
+        piece = reader.read(777)
+        if not piece:
+            break
+        pieces.append(piece)
+    assert b"".join(pieces) == text.encode("utf-8")
+    assert github_client._Utf8Reader(text).read() == text.encode("utf-8")
+
+
+@pytest.mark.parametrize("data, sha", [
+    # Values from `git hash-object`
+    (b"", "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"),
+    (b"print(1)\n", "b917a726c93f902e43291d9009d6488385133b67"),
+])
+def test_git_blob_sha_matches_git(data, sha):
+    assert github_client.git_blob_sha(data) == sha
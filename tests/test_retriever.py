@@ -0,0 +1,107 @@
+"""Tests for the pure retrieval helpers in retrieval.retriever."""
+import random
+
+import numpy as np
+
+from retrieval.retriever import build_context, mmr_select
+
+
+def _build_context_reference(results, max_chars=8000):
+    # The original block-per-result implementation
+    parts = []
+    total = 0
+    for i, r in enumerate(results, start=1):
+        meta = r.get("metadata", {}) or {}
+        header = f"[CTX #{i}] {meta.get('repo', '')} :: {meta.get('file_path', '')} :: chunk {meta.get('chunk_index', None)}"
+        block = f"{header}\n{r.get('document') or ''}".strip()
+        if total + len(block) + 2 > max_chars:
+            break
+        parts.append(block)
+        total += len(block) + 2
+    return "\n\n---\n\n".join(parts)
+
+
+def test_build_context_formats_headers_and_separators():
+    results = [
+        {"document": "def f():\n    return 1", "metadata": {"repo": "o/r", "file_path": "a.py", "chunk_index": 0}},
+        {"document": "# Title", "metadata": {"repo": "o/r", "file_path": "README.md", "chunk_index": 2}},
+    ]
+    assert build_context(results) == (
+        "[CTX #1] o/r :: a.py :: chunk 0\ndef f():\n    return 1"
+        "\n\n---\n\n"
+        "[CTX #2] o/r :: README.md :: chunk 2\n# Title"
+    )
+
+
+def test_build_context_stops_at_max_chars():
+    results = [{"document": "x" * 50, "metadata": {"repo": "o/r", "file_path": "a.py", "chunk_index": i}}
+               for i in range(10)]
+    context = build_context(results, max_chars=200)
+    assert context.count("[CTX #") == 2
+    assert len(context) <= 200
+    assert build_context(results, max_chars=10) == ""
+
+
+def test_build_context_matches_reference_fuzz():
+    rng = random.Random(0)
+    for _ in range(50000):
+        results = []
+        for _ in range(rng.randint(0, 6)):
+            doc = "".join(rng.choice("ab \n") for _ in range(rng.randint(0, 40)))
+            meta = rng.choice([None, {}, {"repo": "o/r", "file_path": "x.py", "chunk_index": rng.randint(0, 9)}])
+            result = {"document": doc}
+            if meta is not None:
+                result["metadata"] = meta
+            if rng.random() < 0.1:
+                result = {"metadata": meta}
+            results.append(result)
+        max_chars = rng.randint(0, 400)
+        assert build_context(results, max_chars) == _build_context_reference(results, max_chars), (results, max_chars)
+
+
+def _mmr_reference(query_vec, cand_vecs, k, lambda_mult=0.5):
+    # Textbook MMR: recompute every remaining candidate's score per step
+    def cos(a, b):
+        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    def score(i, selected):
+        if not selected:
+            return cos(query_vec, cand_vecs[i])
+        redundancy = max(cos(cand_vecs[i], cand_vecs[j]) for j in selected)
+        return lambda_mult * cos(query_vec, cand_vecs[i]) - (1 - lambda_mult) * redundancy
+
+    remaining = list(range(len(cand_vecs)))
+    selected = []
+    while remaining and len(selected) < k:
+        best = max(remaining, key=lambda i: score(i, selected))
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def test_mmr_select_skips_near_duplicates():
+    query = [1.0, 0.3]
+    # 0 and 1 are near-duplicates; 1 is the closest to the query
+    cands = [[1.0, 0.25], [1.0, 0.26], [0.3, 1.0]]
+    assert mmr_select(query, cands, k=2) == [1, 2]
+    # With no diversity weight it is plain similarity order
+    assert mmr_select(query, cands, k=2, lambda_mult=1.0) == [1, 0]
+
+
+def test_mmr_select_clamps_k():
+    cands = [[1.0, 0.0], [0.0, 1.0]]
+    assert mmr_select([1.0, 0.0], cands, k=0) == []
+    assert sorted(mmr_select([1.0, 0.0], cands, k=5)) == [0, 1]
+    assert mmr_select([1.0, 0.0], np.zeros((0, 2)), k=3) == []
+
+
+def test_mmr_select_matches_reference_fuzz():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        n = int(rng.integers(1, 12))
+        dim = int(rng.integers(2, 8))
+        cands = rng.standard_normal((n, dim))
+        query = rng.standard_normal(dim)
+        k = int(rng.integers(1, n + 1))
+        lambda_mult = float(rng.choice([0.0, 0.3, 0.5, 0.8, 1.0]))
+        assert mmr_select(query, cands, k, lambda_mult) == _mmr_reference(query, cands, k, lambda_mult)
@@ -0,0 +1,89 @@
+"""Tests for the path and id helpers in ingest.utils."""
+import hashlib
+import os
+import random
+
+import pytest
+
+from ingest import utils
+
+
+@pytest.mark.parametrize("path", [
+    "",
+    "README",
+    "a.py",
+    "src/App.TSX",
+    "archive.tar.gz",
+    ".gitignore",
+    "..hidden",
+    "dir/.env",
+    "dir.d/file",
+    "dir.d/.rc",
+    "trailing.",
+    "a/b/",
+    "....",
+    ".a.b",
+])
+def test_file_ext_matches_splitext(path):
+    assert utils.file_ext(path) == os.path.splitext(path)[1].lower()
+
+
+def test_file_ext_matches_splitext_fuzz():
+    rng = random.Random(0)
+    alphabet = "aB." + os.sep + (os.altsep or "")
+    for _ in range(50000):
+        path = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+        assert utils.file_ext(path) == os.path.splitext(path)[1].lower(), repr(path)
+
+
+def test_chunk_id_is_stable():
+    # Stored collections are keyed by these ids; changing the format would
+    # make re-ingestion store every chunk a second time
+    assert utils.chunk_id("octo/repo", "src/app.py", 3) == "a2e122b546c24e84"
+
+
+def test_chunk_id_is_blake2b_of_repo_path_index():
+    rng = random.Random(0)
+    repos = ["octo/repo", "other/repo", "", "ünï/cödé"]
+    # Interleave repos so each cached per-repo hash state is reused out of order
+    for _ in range(2000):
+        repo = rng.choice(repos)
+        path = "".join(rng.choice("ab/|.") for _ in range(rng.randint(0, 10)))
+        index = rng.choice([rng.randint(0, 500), str(rng.randint(0, 9))])
+        expected = hashlib.blake2b(f"{repo}|{path}|{index}".encode("utf-8"), digest_size=8).hexdigest()
+        assert utils.chunk_id(repo, path, index) == expected
+
+
+def test_chunk_id_has_fixed_length():
+    ids = {utils.chunk_id("octo/repo", f"dir/file{i}.py", i) for i in range(1000)}
+    assert len(ids) == 1000
+    assert all(len(i) == 16 and "::" not in i for i in ids)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", False),
+    ("print('hello')\n", False),
+    ("col1\tcol2\r\n\fpage two\n", False),
+    ("abc\x00def", True),
+    ("\x01\x02\x03abcdef", True),
+    # Exactly BINARY_CONTROL_RATIO (3 of 10) is still text
+    ("\x01\x02\x03abcdefg", False),
+    ("\x1b[31mred\x1b[0m plain terminal output", False),
+])
+def test_looks_binary(text, expected):
+    assert utils.looks_binary(text) is expected
+
+
+def test_looks_binary_only_samples_the_start():
+    text = "x" * utils.BINARY_SNIFF_CHARS + "\x00" * 100
+    assert utils.looks_binary(text) is False
+    assert utils.looks_binary("\x00" + text) is True
+
+
+def test_looks_binary_matches_control_ratio_fuzz():
+    rng = random.Random(0)
+    alphabet = ["a", " ", "\t", "\n", "\r", "\f", "\x01", "\x07", "\x1b", "\x7f", "é"]
+    for _ in range(20000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 40)))
+        controls = sum(1 for c in text if ord(c) < 32 and c not in "\t\n\f\r")
+        assert utils.looks_binary(text) is (controls / len(text) > utils.BINARY_CONTROL_RATIO), repr(text)
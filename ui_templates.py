@@ -0,0 +1,95 @@
+"""Static HTML used by the Streamlit UI (app.py).
+
+Streamlit re-executes app.py on every interaction, so the markup lives in
+this imported module and is built once per process. *_TEMPLATE strings are
+filled with `str.format` / `str.format_map` at render time.
+"""
+
+# Folder-tree icon per lowercase file extension; anything else gets FILE_ICON
+FILE_ICON = "📄"
+FILE_ICONS = {
+    **dict.fromkeys((".py", ".js", ".ts", ".java", ".cpp", ".c"), "💻"),
+    **dict.fromkeys((".md", ".txt", ".rst"), "📝"),
+    **dict.fromkeys((".json", ".yaml", ".yml", ".xml", ".toml"), "⚙️"),
+}
+
+HEADER_HTML = """\
+<div style="text-align: center; padding: 2rem 1rem 1rem 1rem;">
+    <h1 style="margin: 0; font-size: 2.5rem;">💡 GitHub Repo Explainer Bot</h1>
+    <p style="color: #666; font-size: 1.2rem; margin-top: 0.5rem;">
+        Understand any open-source repo — explained in simple terms
+    </p>
+</div>
+"""
+
+HERO_HTML = """\
+<div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            padding: 2rem; border-radius: 15px; color: white; text-align: center;
+            box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+    <h2 style="margin: 0 0 1rem 0;">🎓 Learn by Exploring</h2>
+    <p style="font-size: 1.1rem; margin: 0;">
+        Paste a GitHub link below and I'll help you understand the project.<br>
+        Ask questions in plain English — I'll explain like a teacher.
+    </p>
+</div>
+"""
+
+REPO_BANNER_TEMPLATE = """\
+<div style="background: linear-gradient(90deg, #11998e 0%, #38ef7d 100%);
+            padding: 1.5rem; border-radius: 10px; color: white; margin-bottom: 1rem;">
+    <h3 style="margin: 0;">✅ Repository Ready: {repo_name}</h3>
+    <p style="margin: 0.5rem 0 0 0; opacity: 0.95;">
+        📦 {file_count} files •
+        📄 {chunk_count} chunks •
+        💾 Stored in <code>{collection}</code>
+    </p>
+</div>
+"""
+
+REPO_CARD_TEMPLATE = """\
+<div style="background: #f8f9fa; padding: 1rem; border-radius: 8px;
+            border-left: 4px solid #667eea;">
+    <p style="margin: 0;"><strong>Repository:</strong><br>
+       <a href="{repo_url}" target="_blank">{repo_name}</a>
+    </p>
+    <p style="margin: 0.5rem 0 0 0;"><strong>Files indexed:</strong> {file_count}</p>
+    <p style="margin: 0.5rem 0 0 0;"><strong>Code chunks:</strong> {chunk_count}</p>
+</div>
+"""
+
+TIP_HTML = """\
+<div style="background: #fff3cd; padding: 1rem; border-radius: 8px;
+            border-left: 4px solid #ffc107; margin-bottom: 1rem;">
+    <p style="margin: 0; color: #856404;">
+        💡 <strong>Tip:</strong> Ask specific questions like:
+        "What does main.py do?" or "How does authentication work?"
+    </p>
+</div>
+"""
+
+QUESTION_CARD_TEMPLATE = """\
+<div style="background: #e7f3ff; padding: 1rem; border-radius: 8px;
+            border-left: 4px solid #2196F3; margin: 1rem 0;">
+    <strong style="color: #1976D2;">❓ Your Question:</strong>
+    <p style="margin: 0.5rem 0 0 0; color: #333;">{question}</p>
+</div>
+"""
+
+FOLLOW_UP_HTML = """\
+<div style="background: #f0f0f0; padding: 0.75rem; border-radius: 6px;
+            margin-top: 1rem; text-align: center;">
+    <p style="margin: 0; color: #666;">
+        💭 <strong>Have a follow-up question?</strong>
+        Just ask above — I remember the context!
+    </p>
+</div>
+"""
+
+FOOTER_TEMPLATE = """\
+<div style="text-align: center; color: #999; padding: 1rem;">
+    <p style="margin: 0;">Built with ❤️ using Streamlit, ChromaDB, and Groq LLM</p>
+    <p style="margin: 0.25rem 0 0 0; font-size: 0.9rem;">
+        Embeddings: sentence-transformers/all-MiniLM-L6-v2 • Model: {model}
+    </p>
+</div>
+"""